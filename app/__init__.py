@@ -67,6 +67,13 @@ def create_app(config_class=Config) -> Flask:
     db.init_app(app)
     limiter.init_app(app)
     csrf.init_app(app)
+    if app.config.get("NPLUSONE_ENABLED"):
+        try:
+            from nplusone.ext.flask_sqlalchemy import NPlusOne
+
+            NPlusOne(app)
+        except ImportError:
+            app.logger.warning("NPLUSONE_ENABLED is set but nplusone is not installed")
 
     app.register_blueprint(public)
     app.register_blueprint(auth)
@@ -98,13 +105,18 @@ def create_app(config_class=Config) -> Flask:
         from .auth_utils import current_user
         from .models import Notification
 
+        from flask import g
+
         u = current_user()
         unread = 0
         if u:
-            try:
-                unread = Notification.query.filter_by(user_id=u.id, seen_at=None).count()
-            except Exception:
-                unread = 0
+            # Views that already counted unread notifications leave the value on g
+            unread = g.get("_unread_notifications")
+            if unread is None:
+                try:
+                    unread = Notification.query.filter_by(user_id=u.id, seen_at=None).count()
+                except Exception:
+                    unread = 0
 
         from flask_wtf.csrf import generate_csrf
         
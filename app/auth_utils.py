@@ -1,6 +1,6 @@
 from functools import wraps
 
-from flask import redirect, request, session, url_for
+from flask import g, redirect, request, session, url_for
 
 from .extensions import db
 from .models import User
@@ -10,7 +10,13 @@ def current_user():
     user_id = session.get("user_id")
     if not user_id:
         return None
-    return db.session.get(User, user_id)
+    # Memoized per request: views and helpers call this many times.
+    cached = g.get("_current_user")
+    if cached is not None and cached.id == user_id:
+        return cached
+    user = db.session.get(User, user_id)
+    g._current_user = user
+    return user
 
 
 def login_required(view):
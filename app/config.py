@@ -6,6 +6,21 @@ _IS_VERCEL = str(os.environ.get("VERCEL") or "").strip().lower() in {"1", "true"
 )
 
 
+
+def _engine_options(database_url: str | None) -> dict:
+    """Connection pool settings for server databases (SQLite keeps SQLAlchemy's defaults)."""
+    if not database_url or database_url.startswith("sqlite"):
+        return {}
+    return {
+        # Serverless instances handle one request at a time, so keep their pools small
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", "2" if _IS_VERCEL else "20")),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "0" if _IS_VERCEL else "10")),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+        "pool_use_lifo": True,
+    }
+
+
 class Config:
     """Production configuration.
 
@@ -26,6 +41,7 @@ class Config:
     else:
         SQLALCHEMY_DATABASE_URI = "sqlite:///applicant_portal.db"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(DATABASE_URL)
 
     # Magic links
     MAGIC_LINK_TTL_HOURS = int(os.environ.get("MAGIC_LINK_TTL_HOURS", "72"))
@@ -80,8 +96,13 @@ class Config:
         os.environ.get("CANDIDATE_UPLOAD_EMAIL_THROTTLE_MINUTES", "30")
     )
 
+    # Send emails from a background thread after commit (off by default on Vercel: threads end with the response)
+    EMAIL_ASYNC = os.environ.get("EMAIL_ASYNC", "false" if _IS_VERCEL else "true").lower() in ("true", "1", "yes")
+
     # Storage
     STORAGE_MODE = os.environ.get("STORAGE_MODE", "local")
+    # Local storage behind nginx: internal location mapped to the uploads folder (e.g. "/_protected/")
+    X_ACCEL_REDIRECT_PREFIX = os.environ.get("X_ACCEL_REDIRECT_PREFIX", "")
 
     # Supabase
     SUPABASE_URL = os.environ.get("SUPABASE_URL", "")
@@ -90,6 +111,17 @@ class Config:
     SUPABASE_STORAGE_BUCKET = os.environ.get("SUPABASE_STORAGE_BUCKET", "applicant-documents")
     SUPABASE_AUTH_ENABLED = os.environ.get("SUPABASE_AUTH_ENABLED", "false").lower() in ("true", "1", "yes")
 
+    # Admin: run the delete-user reassignment as one raw SQL batch instead of ORM bulk updates
+    USER_DELETE_RAW_SQL = os.environ.get("USER_DELETE_RAW_SQL", "false").lower() in ("true", "1", "yes")
+
+    # Rate limiting (Flask-Limiter): in-memory counters are per worker process; use e.g.
+    # redis://host:6379/0 (requires the `redis` package) to share limits across workers
+    RATELIMIT_STORAGE_URI = os.environ.get("RATELIMIT_STORAGE_URI", "memory://")
+    RATELIMIT_STRATEGY = os.environ.get("RATELIMIT_STRATEGY", "moving-window")
+
+    # Lazy-load (N+1) detection is a development aid only
+    NPLUSONE_ENABLED = False
+
 
 class DevConfig(Config):
     """Development configuration - allows insecure defaults for local testing."""
@@ -105,6 +137,7 @@ class DevConfig(Config):
     else:
         SQLALCHEMY_DATABASE_URI = "sqlite:///applicant_portal.db"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(DATABASE_URL)
 
     MAGIC_LINK_TTL_HOURS = int(os.environ.get("MAGIC_LINK_TTL_HOURS", "72"))
     MAGIC_LINK_SCOPE_UPLOAD = "upload_documents"
@@ -148,7 +181,10 @@ class DevConfig(Config):
         os.environ.get("CANDIDATE_UPLOAD_EMAIL_THROTTLE_MINUTES", "30")
     )
 
+    EMAIL_ASYNC = os.environ.get("EMAIL_ASYNC", "false" if _IS_VERCEL else "true").lower() in ("true", "1", "yes")
+
     STORAGE_MODE = os.environ.get("STORAGE_MODE", "local")
+    X_ACCEL_REDIRECT_PREFIX = os.environ.get("X_ACCEL_REDIRECT_PREFIX", "")
 
     # Supabase
     SUPABASE_URL = os.environ.get("SUPABASE_URL", "")
@@ -156,3 +192,13 @@ class DevConfig(Config):
     SUPABASE_SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
     SUPABASE_STORAGE_BUCKET = os.environ.get("SUPABASE_STORAGE_BUCKET", "applicant-documents")
     SUPABASE_AUTH_ENABLED = os.environ.get("SUPABASE_AUTH_ENABLED", "false").lower() in ("true", "1", "yes")
+
+    # Admin: run the delete-user reassignment as one raw SQL batch instead of ORM bulk updates
+    USER_DELETE_RAW_SQL = os.environ.get("USER_DELETE_RAW_SQL", "false").lower() in ("true", "1", "yes")
+
+    RATELIMIT_STORAGE_URI = os.environ.get("RATELIMIT_STORAGE_URI", "memory://")
+    RATELIMIT_STRATEGY = os.environ.get("RATELIMIT_STRATEGY", "moving-window")
+
+    # Dev: flag lazy loads in request handlers (requires `pip install nplusone`)
+    NPLUSONE_ENABLED = os.environ.get("NPLUSONE_ENABLED", "false").lower() in ("true", "1", "yes")
+    NPLUSONE_RAISE = os.environ.get("NPLUSONE_RAISE", "true").lower() in ("true", "1", "yes")
@@ -3,15 +3,49 @@ import html as _html
 import os
 import re
 import time
+import urllib.error
 import urllib.parse
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 
 from flask import current_app
 
+from .http_utils import send_request
 from .url_utils import public_url_for
 
 _token_cache = {"access_token": None, "expires_at": 0}
 
+# Small shared pool for fire-and-forget sends (see send_in_background)
+_email_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="email")
+
+_GRAPH_HOST = "graph.microsoft.com"
+
+
+def send_in_background(fn, /, *args, **kwargs) -> None:
+    """
+    Run an email send function off the request path.
+
+    Call this *after* db.session.commit() so no mail goes out for a rolled-back change.
+    Runs inline when EMAIL_ASYNC is disabled (e.g. serverless, where threads die with the response).
+    Failures are logged, never raised.
+    """
+    app = current_app._get_current_object()
+    if not app.config.get("EMAIL_ASYNC"):
+        try:
+            fn(*args, **kwargs)
+        except Exception:
+            app.logger.warning("Email send failed", exc_info=True)
+        return
+
+    def _run():
+        with app.app_context():
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                app.logger.warning("Background email send failed", exc_info=True)
+
+    _email_executor.submit(_run)
+
 # region signature
 def _signature_sender_email() -> str:
     """
@@ -229,7 +263,7 @@ def _send_graph_mail(to_email: str, subject: str, html_body: str) -> bool:
         # endregion agent log
         return False
 
-    url = f"https://graph.microsoft.com/v1.0/users/{urllib.parse.quote(sender)}/sendMail"
+    url = f"https://{_GRAPH_HOST}/v1.0/users/{urllib.parse.quote(sender)}/sendMail"
     # region agent log
     _dbg(
         "B",
@@ -250,20 +284,19 @@ def _send_graph_mail(to_email: str, subject: str, html_body: str) -> bool:
         },
         "saveToSentItems": True,
     }
-    req = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"), method="POST")
-    req.add_header("Authorization", f"Bearer {token}")
-    req.add_header("Content-Type", "application/json")
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
     try:
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            # region agent log
-            _dbg(
-                "B",
-                "app/email.py:_send_graph_mail:response",
-                "Graph sendMail response",
-                {"status": getattr(resp, "status", None)},
-            )
-            # endregion agent log
-            return 200 <= resp.status < 300
+        # Kept-alive connection per sending thread; errors are raised as urllib's HTTPError/URLError
+        status, _ = send_request("POST", url, data=json.dumps(body).encode("utf-8"), headers=headers, timeout=10)
+        # region agent log
+        _dbg(
+            "B",
+            "app/email.py:_send_graph_mail:response",
+            "Graph sendMail response",
+            {"status": status},
+        )
+        # endregion agent log
+        return 200 <= status < 300
     except urllib.error.HTTPError as e:
         # region agent log
         err_payload = {"status": getattr(e, "code", None)}
@@ -737,6 +770,28 @@ def send_step_ready_notification(
     return False
 
 
+def send_step_ready_notifications(
+    *,
+    to_emails: list[str],
+    step_name: str,
+    reference_number: str,
+    application_url: str,
+    completed_by_email: str | None = None,
+) -> int:
+    """Send the step-ready alert to several recipients; returns how many were sent."""
+    sent = 0
+    for to_email in to_emails:
+        if send_step_ready_notification(
+            to_email=to_email,
+            step_name=step_name,
+            reference_number=reference_number,
+            application_url=application_url,
+            completed_by_email=completed_by_email,
+        ):
+            sent += 1
+    return sent
+
+
 def send_candidate_upload_notification(
     *,
     to_email: str,
@@ -816,6 +871,28 @@ def send_candidate_upload_notification(
     return False
 
 
+def send_candidate_upload_notifications(
+    *,
+    to_emails: list[str],
+    reference_number: str,
+    application_url: str,
+    doc_title: str | None = None,
+    uploaded_file_names: list[str] | None = None,
+) -> int:
+    """Send the candidate-upload alert to several recipients; returns how many were sent."""
+    sent = 0
+    for to_email in to_emails:
+        if send_candidate_upload_notification(
+            to_email=to_email,
+            reference_number=reference_number,
+            application_url=application_url,
+            doc_title=doc_title,
+            uploaded_file_names=uploaded_file_names,
+        ):
+            sent += 1
+    return sent
+
+
 def send_application_rejection(email: str, reference_number: str, reason: str | None = None) -> None:
     subject = "Neo Lox GmbH – Rückmeldung zu Ihrer Bewerbung"
     signature = _email_signature_html()
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import http.client
+import io
+import select
+import threading
+from typing import Any
+from urllib import error, parse, request
+
+# Kept-alive connections of the current thread, keyed by (scheme, netloc); see send_request
+_local = threading.local()
+
+# Methods a server may see twice without harm (RFC 9110, 9.2.2)
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"})
+
+
+def _body_start(data: Any) -> int | None:
+    """Offset a body stream starts at (the caller may have positioned it past 0); None if unknown."""
+    if data is None or isinstance(data, bytes):
+        return 0
+    try:
+        return data.tell()
+    except Exception:
+        return None
+
+
+def _rewind(data: Any, start: int | None) -> bool:
+    """Put a request body back at its start so it can be sent again (for the stale-connection retry)."""
+    if data is None or isinstance(data, bytes):
+        return True
+    if start is None:
+        return False
+    try:
+        data.seek(start)
+        return True
+    except Exception:
+        return False
+
+
+def _dropped(conn: http.client.HTTPConnection) -> bool:
+    # An idle keep-alive socket only turns readable when the server closed it (or sent junk)
+    if conn.sock is None:
+        return False
+    try:
+        return bool(select.select([conn.sock], [], [], 0)[0])
+    except (OSError, ValueError):
+        return True
+
+
+def _proxied(parts: parse.SplitResult) -> bool:
+    # Same environment lookup urlopen does (HTTP(S)_PROXY, NO_PROXY)
+    return parts.scheme in request.getproxies() and not request.proxy_bypass(parts.hostname or "")
+
+
+def send_request(
+    method: str, url: str, *, data: Any = None, headers: dict[str, str], timeout: float
+) -> tuple[int, bytes]:
+    """
+    Send a request over this thread's kept-alive connection to the URL's host; return (status, body).
+
+    urllib.request.urlopen opens a new TCP + TLS connection per call; reusing one lets consecutive
+    calls to the same API skip that. Failures are raised as urllib's HTTPError / URLError, like
+    urlopen does. Redirects are not followed: a 3xx is raised as HTTPError too.
+
+    A connection the server has closed while idle is replaced before use. If it turns out closed
+    anyway, the request is retried once on a new connection, but only when it is safe: the request
+    could not be written, or the method is idempotent. Requests that should go through a proxy
+    (HTTP(S)_PROXY / NO_PROXY) are handed to urlopen.
+    """
+    parts = parse.urlsplit(url)
+    if _proxied(parts):
+        req = request.Request(url, data=data, headers=headers, method=method)
+        with request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, resp.read()
+
+    key = (parts.scheme, parts.netloc)
+    target = parts.path + (f"?{parts.query}" if parts.query else "")
+    conns = _local.__dict__.setdefault("conns", {})
+
+    def drop(conn: http.client.HTTPConnection) -> None:
+        conn.close()
+        conns.pop(key, None)
+
+    start = _body_start(data)
+    for attempt in range(2):
+        conn = conns.get(key)
+        if conn is not None and _dropped(conn):
+            drop(conn)
+            conn = None
+        reused = conn is not None
+        if conn is None:
+            conn_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+            conn = conns[key] = conn_cls(parts.netloc, timeout=timeout)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        retry = reused and not attempt
+        try:
+            conn.request(method, target, body=data, headers=headers)
+        except (ConnectionResetError, BrokenPipeError) as exc:
+            # The server closed the connection before taking the request, so it never saw it.
+            # The failed send may have read part of a stream body; it is sent again from its start.
+            drop(conn)
+            if retry and _rewind(data, start):
+                continue
+            raise error.URLError(exc) from exc
+        except (OSError, http.client.HTTPException) as exc:
+            drop(conn)
+            raise error.URLError(exc) from exc
+        try:
+            resp = conn.getresponse()
+            raw = resp.read()
+        except (http.client.RemoteDisconnected, ConnectionResetError) as exc:
+            # The request went out; sending it again is only safe if repeating it is harmless
+            drop(conn)
+            if retry and method.upper() in _IDEMPOTENT_METHODS and _rewind(data, start):
+                continue
+            raise error.URLError(exc) from exc
+        except (OSError, http.client.HTTPException) as exc:
+            drop(conn)
+            raise error.URLError(exc) from exc
+        if resp.status >= 300:
+            raise error.HTTPError(url, resp.status, resp.reason, resp.headers, io.BytesIO(raw))
+        return resp.status, raw
+    raise AssertionError("unreachable")
@@ -1,6 +1,7 @@
 from datetime import datetime, date
 
 from sqlalchemy import Index
+from sqlalchemy.dialects import postgresql, sqlite
 
 from .extensions import db
 
@@ -36,6 +37,15 @@ class WorkflowStep(db.Model):
     form_schema = db.Column(db.JSON, nullable=True)
     automation_rules = db.Column(db.JSON, nullable=True)
 
+    @property
+    def allowed_user_ids(self) -> frozenset[int]:
+        """Owner + fallback user ids, computed once per loaded instance (sessions are per request)."""
+        ids = self.__dict__.get("_allowed_user_ids")
+        if ids is None:
+            ids = frozenset({self.owner_user_id, *(u.id for u in self.fallback_users or [])} - {None})
+            self.__dict__["_allowed_user_ids"] = ids
+        return ids
+
 
 workflow_step_fallback_users = db.Table(
     "workflow_step_fallback_users",
@@ -78,6 +88,11 @@ class JobPosting(db.Model):
     published_until = db.Column(db.Date, nullable=True)
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=datetime.utcnow)
 
+    document_requirements = db.relationship("DocumentRequirement", lazy="select", viewonly=True)
+
+    # Public listing/detail: published + published_until >= today, newest first
+    __table_args__ = (Index("idx_job_postings_public", "published", "published_until", created_at.desc()),)
+
 
 class Candidate(db.Model):
     __tablename__ = "candidates"
@@ -110,6 +125,15 @@ class Application(db.Model):
     last_candidate_upload_email_at = db.Column(db.DateTime(timezone=True), nullable=True)
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=datetime.utcnow)
 
+    candidate = db.relationship("Candidate", lazy="select")
+    job = db.relationship("JobPosting", lazy="select")
+    # Read-only collections (used for eager loading); rows are still written via their own models.
+    attachments = db.relationship("Attachment", lazy="select", viewonly=True, order_by="Attachment.id")
+    notes = db.relationship("Note", lazy="select", viewonly=True, order_by="Note.created_at.desc()")
+    step_instances = db.relationship("ApplicationStepInstance", lazy="select", viewonly=True)
+
+    __table_args__ = (Index("idx_applications_status_created_at", "status", "created_at"),)
+
 
 class ApplicationStepInstance(db.Model):
     __tablename__ = "application_step_instances"
@@ -117,12 +141,18 @@ class ApplicationStepInstance(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     application_id = db.Column(db.Integer, db.ForeignKey("applications.id"), nullable=False, index=True)
     step_id = db.Column(db.Integer, db.ForeignKey("workflow_steps.id"), nullable=False, index=True)
+    # Copy of WorkflowStep.step_order (steps are only re-ordered while a workflow has no instances)
+    step_order = db.Column(db.Integer, nullable=True)
     state = db.Column(db.String(50), nullable=False, default="open")
     data_json = db.Column(db.JSON, nullable=True)
     completed_at = db.Column(db.DateTime(timezone=True), nullable=True)
     completed_by_user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True, index=True)
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=datetime.utcnow)
 
+    step = db.relationship("WorkflowStep", lazy="select")
+
+    __table_args__ = (Index("idx_step_instances_app_state_order", "application_id", "state", "step_order"),)
+
 
 class Attachment(db.Model):
     __tablename__ = "attachments"
@@ -134,8 +164,12 @@ class Attachment(db.Model):
     file_type = db.Column(db.String(100), nullable=True)
     document_type = db.Column(db.String(50), nullable=True)  # cv, cover_letter, certificate, other
     uploaded_by = db.Column(db.String(50), nullable=False, default="candidate")
+    size_bytes = db.Column(db.BigInteger, nullable=True)  # recorded at upload; NULL for older rows
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=datetime.utcnow)
 
+    # Upload lists: per application, newest first (index-ordered, no sort step)
+    __table_args__ = (Index("idx_attachments_application_id_desc", "application_id", id.desc()),)
+
 
 class DocumentRequirement(db.Model):
     __tablename__ = "document_requirements"
@@ -192,6 +226,20 @@ class AttachmentDocumentLink(db.Model):
     __table_args__ = (Index("idx_attachment_node_unique", "attachment_id", "node_id", unique=True),)
 
 
+def insert_document_links(rows: list[dict]) -> None:
+    """
+    Bulk-insert attachment/checklist links in one statement; pairs that are already linked
+    are skipped via ON CONFLICT DO NOTHING on idx_attachment_node_unique (PostgreSQL and SQLite).
+    """
+    if not rows:
+        return
+    dialect_insert = postgresql.insert if db.session.get_bind().dialect.name == "postgresql" else sqlite.insert
+    db.session.execute(
+        dialect_insert(AttachmentDocumentLink).on_conflict_do_nothing(index_elements=["attachment_id", "node_id"]),
+        rows,
+    )
+
+
 class Note(db.Model):
     __tablename__ = "notes"
 
@@ -213,12 +261,27 @@ class Notification(db.Model):
     seen_at = db.Column(db.DateTime(timezone=True), nullable=True)
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=datetime.utcnow)
 
+    # Unread badge/counts only ever look at rows with seen_at IS NULL
+    __table_args__ = (
+        Index(
+            "idx_notifications_user_unread",
+            "user_id",
+            "application_id",
+            postgresql_where=seen_at.is_(None),
+            sqlite_where=seen_at.is_(None),
+        ),
+        # Notification list: per user, newest first
+        Index("idx_notifications_user_created", "user_id", created_at.desc()),
+    )
+
 
 class MagicLinkToken(db.Model):
     __tablename__ = "magic_link_tokens"
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     application_id = db.Column(db.Integer, db.ForeignKey("applications.id"), nullable=False, index=True)
+    # 20-byte keyed BLAKE2b for new links; 32-byte HMAC-SHA256 for links issued before the switch,
+    # which lookups still accept until they are no longer needed (see security.find_magic_link_token)
     token_hash = db.Column(db.LargeBinary, nullable=False, unique=True)
     scope = db.Column(db.Text, nullable=False)
     expires_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
@@ -231,7 +294,8 @@ class MagicLinkToken(db.Model):
         default=datetime.utcnow,
     )
 
-    __table_args__ = (Index("idx_magic_link_tokens_hash", "token_hash"),)
+    # (token_hash, scope) covers the /r/<token> lookup without touching the heap row.
+    __table_args__ = (Index("idx_magic_link_tokens_hash_scope", "token_hash", "scope", unique=True),)
 
 
 class PasswordResetToken(db.Model):
@@ -2,7 +2,9 @@ from functools import wraps
 import secrets
 from datetime import date, datetime
 
-from flask import Blueprint, redirect, render_template, request, url_for
+from flask import Blueprint, current_app, redirect, render_template, request, url_for
+from sqlalchemy import text
+from werkzeug.security import generate_password_hash
 
 from ..auth_utils import current_user, login_required
 from ..email import send_test_email, send_user_invitation_email
@@ -23,6 +25,8 @@ from ..models import (
 from ..password_policy import password_policy_error
 from ..security import issue_password_reset_token
 from ..url_utils import public_url_for
+from .internal import invalidate_participants_cache
+from .public import invalidate_job_list_cache
 
 
 def admin_required(view):
@@ -240,11 +244,18 @@ def add_job_doc_node(job_id: int):
     required = request.form.get("required") == "on"
     if not title:
         return redirect(_safe_next_url(job_id))
+    # Parents must be existing nodes of the same job; together with parents never being changed
+    # afterwards this keeps each job's tree acyclic (label building relies on it).
+    parent_id = int(parent_id) if parent_id and str(parent_id).isdigit() else None
+    if parent_id is not None:
+        parent = db.session.get(JobDocumentNode, parent_id)
+        if not parent or parent.job_id != job_id:
+            return redirect(_safe_next_url(job_id))
 
     db.session.add(
         JobDocumentNode(
             job_id=job_id,
-            parent_id=int(parent_id) if parent_id else None,
+            parent_id=parent_id,
             kind=kind,
             code=code,
             title=title,
@@ -380,6 +391,7 @@ def create_job():
     )
     db.session.add(job)
     db.session.commit()
+    invalidate_job_list_cache()
     return redirect(url_for("admin.jobs"))
 
 
@@ -405,6 +417,7 @@ def update_job(job_id: int):
     job.workflow_id = int(request.form.get("workflow_id")) if request.form.get("workflow_id") else None
     job.published = request.form.get("published") == "on"
     db.session.commit()
+    invalidate_job_list_cache()
     return redirect(url_for("admin.edit_job", job_id=job_id, success="Job gespeichert."))
 
 
@@ -510,6 +523,7 @@ def create_workflow():
             db.session.add(step)
 
     db.session.commit()
+    invalidate_participants_cache()
     return redirect(url_for("admin.workflows"))
 
 
@@ -675,6 +689,7 @@ def save_workflow_edit(workflow_id: int):
             db.session.add(s)
 
     db.session.commit()
+    invalidate_participants_cache()
     return redirect(url_for("admin.workflow_detail", workflow_id=workflow_id, success="Workflow gespeichert."))
 
 
@@ -720,6 +735,7 @@ def delete_workflow_step(workflow_id: int, step_id: int):
         s.step_order = i
         db.session.add(s)
     db.session.commit()
+    invalidate_participants_cache()
 
     return redirect(url_for("admin.edit_workflow", workflow_id=workflow_id, success="Step gelöscht."))
 
@@ -779,6 +795,7 @@ def delete_workflow(workflow_id: int):
     WorkflowStep.query.filter_by(workflow_id=workflow_id).delete(synchronize_session=False)
     db.session.delete(workflow)
     db.session.commit()
+    invalidate_participants_cache()
 
     return redirect(url_for("admin.workflows", success="Workflow wurde gelöscht."))
 
@@ -793,8 +810,6 @@ def users():
 @admin.post("/users")
 @admin_required
 def create_user():
-    from werkzeug.security import generate_password_hash
-
     email = (request.form.get("email") or "").strip().lower()
     role = request.form.get("role") or "recruiter"
     if role not in {"admin", "recruiter", "viewer"}:
@@ -815,6 +830,7 @@ def create_user():
     )
     db.session.add(user)
     db.session.commit()
+    invalidate_participants_cache()
 
     # Send invitation email (best-effort)
     try:
@@ -846,6 +862,33 @@ def _user_delete_impact(user_id: int) -> dict[str, int]:
     return impact
 
 
+def _delete_user_sql(session, user_id: int, repl_id: int | None) -> None:
+    """
+    Raw-SQL variant of the delete_user reassignment (USER_DELETE_RAW_SQL).
+
+    Runs all UPDATE/DELETE statements inside the caller's transaction. On PostgreSQL
+    they are sent as a single multi-statement batch (one round-trip); other dialects
+    (e.g. SQLite) execute them one by one.
+    """
+    statements = [
+        f"UPDATE {WorkflowStep.__tablename__} SET owner_user_id = :r WHERE owner_user_id = :u",
+        f"DELETE FROM {workflow_step_fallback_users.name} WHERE user_id = :u",
+        f"UPDATE {ApplicationDocumentStatus.__tablename__} SET updated_by_user_id = :r WHERE updated_by_user_id = :u",
+        f"UPDATE {AttachmentDocumentLink.__tablename__} SET linked_by_user_id = :r WHERE linked_by_user_id = :u",
+        f"UPDATE {Note.__tablename__} SET author_user_id = :r WHERE author_user_id = :u",
+    ]
+    if repl_id:
+        statements.append(f"UPDATE {Notification.__tablename__} SET user_id = :r WHERE user_id = :u")
+    statements.append(f"DELETE FROM {User.__tablename__} WHERE id = :u")
+
+    params = {"u": user_id, "r": repl_id}
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text(";\n".join(statements)), params)
+    else:
+        for stmt in statements:
+            session.execute(text(stmt), params)
+
+
 @admin.get("/users/<int:user_id>/edit")
 @admin_required
 def edit_user(user_id: int):
@@ -869,8 +912,6 @@ def edit_user(user_id: int):
 @admin.post("/users/<int:user_id>/edit")
 @admin_required
 def save_user_edit(user_id: int):
-    from werkzeug.security import generate_password_hash
-
     user_row = db.session.get(User, user_id)
     if not user_row:
         return redirect(url_for("admin.users", error="Benutzer nicht gefunden."))
@@ -898,6 +939,7 @@ def save_user_edit(user_id: int):
 
     db.session.add(user_row)
     db.session.commit()
+    invalidate_participants_cache()
     return redirect(url_for("admin.edit_user", user_id=user_id, success="Benutzer gespeichert."))
 
 
@@ -933,14 +975,19 @@ def delete_user(user_id: int):
 
     # Safety: don't allow deleting the last admin
     if user_row.role == "admin":
-        admin_count = User.query.filter_by(role="admin").count()
-        if admin_count <= 1:
+        has_other_admin = (
+            db.session.query(User.id).filter(User.role == "admin", User.id != user_row.id).limit(1).scalar()
+            is not None
+        )
+        if not has_other_admin:
             return redirect(url_for("admin.edit_user", user_id=user_id, error="Letzter Admin kann nicht gelöscht werden."))
 
     impact = _user_delete_impact(user_row.id)
     needs_replacement = impact.get("notifications", 0) > 0
     replacement_id_raw = (request.form.get("replacement_user_id") or "").strip()
     replacement_id = int(replacement_id_raw) if replacement_id_raw.isdigit() else None
+    if replacement_id == user_row.id:
+        replacement_id = None
 
     if needs_replacement and not replacement_id:
         return redirect(
@@ -950,8 +997,6 @@ def delete_user(user_id: int):
                 error="Dieser Benutzer hat Benachrichtigungen. Bitte Ersatz-Benutzer auswählen (oder Benachrichtigungen erst bereinigen).",
             )
         )
-    if replacement_id == user_row.id:
-        replacement_id = None
 
     if replacement_id:
         repl = db.session.get(User, replacement_id)
@@ -960,6 +1005,13 @@ def delete_user(user_id: int):
     else:
         repl = None
 
+    if current_app.config.get("USER_DELETE_RAW_SQL"):
+        _delete_user_sql(db.session, user_row.id, repl.id if repl else None)
+        db.session.expunge(user_row)
+        db.session.commit()
+        invalidate_participants_cache()
+        return redirect(url_for("admin.users", success="Benutzer gelöscht."))
+
     # Reassign / null out references
     # - Workflow step ownership (nullable)
     WorkflowStep.query.filter_by(owner_user_id=user_row.id).update(
@@ -968,7 +1020,9 @@ def delete_user(user_id: int):
     )
     # - Remove from fallback users association
     db.session.execute(
-        workflow_step_fallback_users.delete().where(workflow_step_fallback_users.c.user_id == user_row.id)
+        workflow_step_fallback_users.delete()
+        .where(workflow_step_fallback_users.c.user_id == user_row.id)
+        .execution_options(synchronize_session=False)
     )
     # Removed: Step instance assignment (no longer using assigned_to_user_id)
     # - Audit-ish fields: keep history by reassigning if possible, else null
@@ -999,4 +1053,5 @@ def delete_user(user_id: int):
 
     db.session.delete(user_row)
     db.session.commit()
+    invalidate_participants_cache()
     return redirect(url_for("admin.users", success="Benutzer gelöscht."))
@@ -11,6 +11,9 @@ from ..url_utils import public_url_for
 
 auth = Blueprint("auth", __name__)
 
+# Checked when no user matches, so unknown emails cost the same KDF work as wrong passwords.
+_DUMMY_HASH = generate_password_hash("x" * 32)
+
 
 @auth.get("/login")
 def login():
@@ -23,7 +26,9 @@ def login_post():
     password = request.form.get("password") or ""
 
     user = User.query.filter_by(email=email).first()
-    if not user or not check_password_hash(user.password_hash, password):
+    pw_hash = user.password_hash if user else _DUMMY_HASH
+    ok = check_password_hash(pw_hash, password)
+    if not user or not ok:
         return render_template("login.html", error="Ungültige Zugangsdaten"), 401
 
     session["user_id"] = user.id
@@ -100,7 +105,7 @@ def reset_password_post(token: str):
 
     user.password_hash = generate_password_hash(new_pw)
     db.session.add(user)
-    db.session.commit()
+    # Commits the new password together with consuming the token
     mark_password_reset_used(record)
 
     return redirect(url_for("auth.login"))
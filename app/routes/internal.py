@@ -1,13 +1,19 @@
 from datetime import datetime, timezone
+from functools import lru_cache, wraps
+import time
+from types import MappingProxyType
+from urllib.parse import quote
 
-from flask import Blueprint, current_app, redirect, render_template, request, url_for
-
-import os
+from flask import Blueprint, current_app, g, redirect, render_template, request, url_for
 
 from flask import send_file
+from werkzeug.utils import send_file as werkzeug_send_file
+from markupsafe import Markup
+from sqlalchemy import and_, case, cast, func, insert, literal, null, or_, select, union_all, update
+from sqlalchemy.orm import joinedload, selectinload
 
 from ..auth_utils import current_user, login_required
-from ..email import send_magic_link, send_application_rejection, send_step_ready_notification
+from ..email import send_application_rejection, send_in_background, send_magic_link, send_step_ready_notifications
 from ..extensions import db
 from ..models import (
     Application,
@@ -23,10 +29,11 @@ from ..models import (
     User,
     WorkflowStep,
     MagicLinkToken,
+    insert_document_links,
     workflow_step_fallback_users,
 )
 from ..security import issue_magic_link
-from ..storage import get_file_url
+from ..storage import get_file_url, uploads_relative_path
 from ..url_utils import public_url_for
 
 internal = Blueprint("internal", __name__, url_prefix="/internal")
@@ -49,17 +56,8 @@ def _deny_if_viewer(application_id: int | None = None):
         )
     return redirect(url_for("internal.applications"))
 
-def _normalize_scheduled_at(raw: str | None) -> tuple[str | None, str | None]:
-    """
-    Accepts either:
-    - German: DD.MM.YYYY HH:MM
-    - HTML datetime-local: YYYY-MM-DDTHH:MM
-    Returns (normalized_german, error_message).
-    """
-    raw = (raw or "").strip()
-    if not raw:
-        return None, "Bitte Termin setzen."
-
+@lru_cache(maxsize=1024)
+def _parse_scheduled(raw: str) -> tuple[str | None, str | None]:
     # German format
     try:
         dt = datetime.strptime(raw, "%d.%m.%Y %H:%M")
@@ -75,31 +73,39 @@ def _normalize_scheduled_at(raw: str | None) -> tuple[str | None, str | None]:
         return None, "Termin-Format ungültig. Bitte Datum & Uhrzeit auswählen."
 
 
-def _naive_utc(dt: datetime | None) -> datetime | None:
+def _normalize_scheduled_at(raw: str | None) -> tuple[str | None, str | None]:
     """
-    Normalize datetimes to naive UTC.
-
-    Needed because PostgreSQL returns timezone-aware datetimes for timezone-aware columns,
-    while templates (and some SQLite setups) often assume naive timestamps.
+    Accepts either:
+    - German: DD.MM.YYYY HH:MM
+    - HTML datetime-local: YYYY-MM-DDTHH:MM
+    Returns (normalized_german, error_message).
     """
-    if not dt:
-        return None
-    if getattr(dt, "tzinfo", None) is not None:
-        try:
-            return dt.astimezone(timezone.utc).replace(tzinfo=None)
-        except Exception:
-            return dt.replace(tzinfo=None)
-    return dt
+    raw = (raw or "").strip()
+    if not raw:
+        return None, "Bitte Termin setzen."
+    return _parse_scheduled(raw)
 
 
-STATUS_META = {
-    "new": {"label": "Neu", "badge": "new"},
-    "in_progress": {"label": "In Bearbeitung", "badge": "in-progress"},
-    "waiting_on_candidate": {"label": "Wartet auf Bewerber", "badge": "waiting"},
-    "completed": {"label": "Abgeschlossen", "badge": "completed"},
-    "rejected": {"label": "Abgelehnt", "badge": "rejected"},
-    "accepted": {"label": "Angenommen", "badge": "accepted"},
-}
+APPLICATIONS_PAGE_SIZE = 50
+
+STATUS_META = MappingProxyType(
+    {
+        "new": {"label": "Neu", "badge": "new"},
+        "in_progress": {"label": "In Bearbeitung", "badge": "in-progress"},
+        "waiting_on_candidate": {"label": "Wartet auf Bewerber", "badge": "waiting"},
+        "completed": {"label": "Abgeschlossen", "badge": "completed"},
+        "rejected": {"label": "Abgelehnt", "badge": "rejected"},
+        "accepted": {"label": "Angenommen", "badge": "accepted"},
+    }
+)
+
+# Rendered once at import; the list template emits one badge per row
+STATUS_BADGE_HTML = MappingProxyType(
+    {
+        key: Markup(f'<span class="badge badge-{meta["badge"]}">{meta["label"]}</span>')
+        for key, meta in STATUS_META.items()
+    }
+)
 
 
 def _active_step_for_application_ids(app_ids: list[int]):
@@ -109,13 +115,18 @@ def _active_step_for_application_ids(app_ids: list[int]):
     """
     if not app_ids:
         return {}
-    apps = Application.query.filter(Application.id.in_(app_ids)).all()
-    instance_ids = [a.current_step_id for a in apps if a.current_step_id]
+    rows = (
+        db.session.query(Application.id, Application.current_step_id)
+        .filter(Application.id.in_(app_ids), Application.current_step_id.isnot(None))
+        .all()
+    )
+    instance_ids = [current_step_id for _app_id, current_step_id in rows]
     if not instance_ids:
         return {}
     rows = (
         db.session.query(ApplicationStepInstance, WorkflowStep)
         .join(WorkflowStep, WorkflowStep.id == ApplicationStepInstance.step_id)
+        .options(selectinload(WorkflowStep.fallback_users))
         .filter(ApplicationStepInstance.id.in_(instance_ids))
         .all()
     )
@@ -138,6 +149,45 @@ def _allowed_user_ids_for_steps(step_ids: list[int]) -> dict[int, set[int]]:
     return out
 
 
+def _assigned_to_user_clause(user_id: int, exclude_statuses: list[str] | None = None):
+    """
+    SQL predicate: the application's active step is owned by `user_id` or lists them as fallback.
+    Usable as a filter for both the "mine" count and the list query.
+    """
+    is_fallback = (
+        select(workflow_step_fallback_users.c.user_id)
+        .where(
+            workflow_step_fallback_users.c.workflow_step_id == WorkflowStep.id,
+            workflow_step_fallback_users.c.user_id == user_id,
+        )
+        .exists()
+    )
+    assigned = (
+        select(Application.id)
+        .join(ApplicationStepInstance, ApplicationStepInstance.id == Application.current_step_id)
+        .join(WorkflowStep, WorkflowStep.id == ApplicationStepInstance.step_id)
+        .where(or_(WorkflowStep.owner_user_id == user_id, is_fallback))
+    )
+    if exclude_statuses:
+        assigned = assigned.where(Application.status.notin_(exclude_statuses))
+    return Application.id.in_(assigned)
+
+
+def _assigned_to_user_count(user_id: int, exclude_statuses: list[str] | None = None) -> int:
+    return int(
+        db.session.scalar(
+            select(func.count()).select_from(Application).where(_assigned_to_user_clause(user_id, exclude_statuses))
+        )
+        or 0
+    )
+
+
+def _application_counts_by_status() -> dict[str, int]:
+    """Returns status -> number of applications (single GROUP BY query)."""
+    rows = db.session.execute(select(Application.status, func.count()).group_by(Application.status)).all()
+    return {status: int(cnt) for status, cnt in rows}
+
+
 # Removed: _can_act_on_active_step - replaced by _can_act_on_step
 
 
@@ -156,32 +206,57 @@ def _can_act_on_step(step_info: dict | None, user: User | None) -> tuple[bool, s
     if user.role == "admin":
         return True, None
 
-    allowed_ids = set()
-    if step.owner_user_id:
-        allowed_ids.add(step.owner_user_id)
-    if getattr(step, "fallback_users", None):
-        allowed_ids.update([u.id for u in step.fallback_users])
-    
-    if user.id in allowed_ids:
+    if user.id in step.allowed_user_ids:
         return True, None
     
     return False, "Nicht Owner/Fallback dieses Steps."
 
 
+def _get_step_with_fallbacks(step_id: int | None) -> WorkflowStep | None:
+    """Load a workflow step with its fallback users in the same round-trip (used for RBAC + notifications)."""
+    if not step_id:
+        return None
+    return db.session.execute(
+        select(WorkflowStep).options(selectinload(WorkflowStep.fallback_users)).where(WorkflowStep.id == step_id)
+    ).scalar_one_or_none()
+
+
 def _active_step_owner_or_fallback_ids(application_id: int) -> set[int]:
-    """Returns set of user IDs who can act on the active step (owner + fallbacks)."""
+    """
+    Returns set of user IDs who can act on the active step (owner + fallbacks).
+    Memoized per request on `g._allowed_ids_cache` (views that already loaded the active step may pre-seed it).
+    """
+    cache: dict[int, set[int]] = g.setdefault("_allowed_ids_cache", {})
+    if application_id in cache:
+        return cache[application_id]
+
     step_info = _active_step_for_application_ids([application_id]).get(application_id)
-    if not step_info:
-        return set()
-    step: WorkflowStep = step_info["step"]
-    ids = set()
-    if step.owner_user_id:
-        ids.add(step.owner_user_id)
-    if getattr(step, "fallback_users", None):
-        ids.update([u.id for u in step.fallback_users])
+    ids = set(step_info["step"].allowed_user_ids) if step_info else set()
+    cache[application_id] = ids
     return ids
 
 
+def _rbac_memo(fn):
+    """
+    Memoize an application-level permission check for the rest of the request.
+    Key: (check name, current user id, application id) on `g._rbac_cache`.
+    """
+
+    @wraps(fn)
+    def wrapper(application: Application, *args, **kwargs) -> bool:
+        u = current_user()
+        if not u or not application:
+            return fn(application, *args, **kwargs)
+        cache: dict[tuple, bool] = g.setdefault("_rbac_cache", {})
+        key = (fn.__name__, u.id, application.id)
+        if key not in cache:
+            cache[key] = fn(application, *args, **kwargs)
+        return cache[key]
+
+    return wrapper
+
+
+@_rbac_memo
 def _can_manage_application(application: Application) -> bool:
     """Application-level actions (accept/reject/resend/revoke) require admin or owner/fallback of active step."""
     u = current_user()
@@ -195,6 +270,52 @@ def _can_manage_application(application: Application) -> bool:
     return u.id in allowed
 
 
+# Process-level cache of participant ids: key -> (expires_at, ids).
+# Admin workflow/user mutations clear it; the TTL bounds staleness across worker processes.
+_PARTICIPANTS_TTL_SECONDS = 60
+_participants_cache: dict[tuple, tuple[float, frozenset[int]]] = {}
+
+
+def invalidate_participants_cache() -> None:
+    _participants_cache.clear()
+
+
+def _cached_participants(key: tuple, loader) -> frozenset[int]:
+    now = time.monotonic()
+    hit = _participants_cache.get(key)
+    if hit and hit[0] > now:
+        return hit[1]
+    ids = frozenset(loader())
+    _participants_cache[key] = (now + _PARTICIPANTS_TTL_SECONDS, ids)
+    return ids
+
+
+def _workflow_participants(workflow_id: int) -> frozenset[int]:
+    """Step owners + fallbacks of a workflow (independent of the application)."""
+
+    def _load() -> set[int]:
+        # UNION (not UNION ALL) deduplicates owners and fallbacks in the database
+        owners = select(WorkflowStep.owner_user_id).where(
+            WorkflowStep.workflow_id == workflow_id,
+            WorkflowStep.owner_user_id.is_not(None),
+        )
+        fallbacks = (
+            select(workflow_step_fallback_users.c.user_id)
+            .join(WorkflowStep, WorkflowStep.id == workflow_step_fallback_users.c.workflow_step_id)
+            .where(WorkflowStep.workflow_id == workflow_id)
+        )
+        return {int(uid) for uid in db.session.execute(owners.union(fallbacks)).scalars()}
+
+    return _cached_participants(("workflow", workflow_id), _load)
+
+
+def _admin_user_ids() -> frozenset[int]:
+    return _cached_participants(
+        ("admins",),
+        lambda: {int(uid) for (uid,) in db.session.query(User.id).filter(User.role == "admin").all() if uid},
+    )
+
+
 def _participant_user_ids_for_application(application: Application) -> set[int]:
     """
     Best-effort: users who are involved in the application's workflow.
@@ -205,31 +326,40 @@ def _participant_user_ids_for_application(application: Application) -> set[int]:
         return ids
 
     # Workflow step owners + fallbacks for this job's workflow
-    job = db.session.get(JobPosting, application.job_id) if application.job_id else None
-    if job and job.workflow_id:
-        steps = WorkflowStep.query.filter_by(workflow_id=job.workflow_id).all()
-        step_ids = [s.id for s in steps]
-        ids.update([int(s.owner_user_id) for s in steps if s.owner_user_id])
-        fallback_ids_by_step = _allowed_user_ids_for_steps(step_ids)
-        for _sid, uids in fallback_ids_by_step.items():
-            ids.update([int(uid) for uid in uids])
+    workflow_id = (
+        db.session.execute(select(JobPosting.workflow_id).where(JobPosting.id == application.job_id)).scalar()
+        if application.job_id
+        else None
+    )
+    if workflow_id:
+        ids.update(_workflow_participants(workflow_id))
 
     # Admins should see terminal events too
-    admin_ids = db.session.query(User.id).filter(User.role == "admin").all()
-    ids.update([int(x[0]) for x in admin_ids if x and x[0]])
+    ids.update(_admin_user_ids())
     return ids
 
 
 def _notify_users(user_ids: set[int], application_id: int, ntype: str, message: str) -> None:
-    for uid in sorted(set(int(x) for x in user_ids if x)):
-        db.session.add(
-            Notification(
-                user_id=uid,
-                application_id=application_id,
-                type=ntype,
-                message=message,
-            )
-        )
+    rows = [
+        {
+            "user_id": uid,
+            "application_id": application_id,
+            "type": ntype,
+            "message": message,
+        }
+        for uid in sorted(set(int(x) for x in user_ids if x))
+    ]
+    if rows:
+        # executemany in one round-trip; created_at comes from the column default
+        db.session.execute(insert(Notification), rows)
+
+
+def _add_system_note(application_id: int, text: str) -> None:
+    # Audit notes written alongside a state change: plain INSERT in the caller's transaction
+    # (no ORM object/RETURNING), so the note commits atomically with the change it records
+    db.session.execute(
+        insert(Note).values(application_id=application_id, author_user_id=current_user().id, text=text)
+    )
 
 
 @internal.get("/")
@@ -241,16 +371,12 @@ def dashboard():
     my_count = 0
     if u_id:
         # "Assigned to me" = I am owner/fallback of the CURRENT active step
-        my_apps = []
-        for app in Application.query.filter(Application.current_step_id.isnot(None)).all():
-            allowed = _active_step_owner_or_fallback_ids(app.id)
-            if u_id in allowed:
-                my_apps.append(app.id)
-        my_count = len(my_apps)
+        my_count = _assigned_to_user_count(u_id)
+    by_status = _application_counts_by_status()
     counts = {
-        "new": Application.query.filter_by(status="new").count(),
-        "in_progress": Application.query.filter_by(status="in_progress").count(),
-        "waiting_on_candidate": Application.query.filter_by(status="waiting_on_candidate").count(),
+        "new": by_status.get("new", 0),
+        "in_progress": by_status.get("in_progress", 0),
+        "waiting_on_candidate": by_status.get("waiting_on_candidate", 0),
         "assigned_to_me": my_count,
     }
     return render_template("internal/dashboard.html", counts=counts)
@@ -270,20 +396,15 @@ def applications():
     user_id = current_user().id
     
     # "Mine" = I am owner/fallback of the current active step
-    my_app_ids = []
-    for app in Application.query.filter(
-        Application.current_step_id.isnot(None),
-        Application.status.notin_(["rejected", "accepted", "completed"])
-    ).all():
-        allowed = _active_step_owner_or_fallback_ids(app.id)
-        if user_id in allowed:
-            my_app_ids.append(app.id)
+    mine_exclude_statuses = ["rejected", "accepted", "completed"]
+    mine_count = _assigned_to_user_count(user_id, mine_exclude_statuses)
 
+    by_status = _application_counts_by_status()
     tab_counts = {
-        "new": Application.query.filter_by(status="new").count(),
-        "mine": len(my_app_ids),
-        "waiting": Application.query.filter_by(status="waiting_on_candidate").count(),
-        "all": Application.query.count(),
+        "new": by_status.get("new", 0),
+        "mine": mine_count,
+        "waiting": by_status.get("waiting_on_candidate", 0),
+        "all": sum(by_status.values()),
     }
 
     # Base query with tab filter
@@ -291,10 +412,7 @@ def applications():
     if tab == "new":
         query = query.filter_by(status="new")
     elif tab == "mine":
-        if my_app_ids:
-            query = query.filter(Application.id.in_(my_app_ids))
-        else:
-            query = Application.query.filter_by(id=-1)  # empty result
+        query = query.filter(_assigned_to_user_clause(user_id, mine_exclude_statuses))
     elif tab == "waiting":
         query = query.filter_by(status="waiting_on_candidate")
     # tab == "all" has no filter
@@ -319,7 +437,29 @@ def applications():
         except ValueError:
             pass
 
-    applications_list = query.order_by(Application.created_at.desc()).all()
+    try:
+        page = max(int(request.args.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+
+    has_next = False
+    if tab == "mine" and not mine_count:
+        # Nothing assigned: skip the list query (and the per-list lookups below)
+        applications_list = []
+    else:
+        # One extra row tells us whether there is a next page without a COUNT(*)
+        applications_list = (
+            query.order_by(Application.created_at.desc(), Application.id.desc())
+            .offset((page - 1) * APPLICATIONS_PAGE_SIZE)
+            .limit(APPLICATIONS_PAGE_SIZE + 1)
+            .all()
+        )
+        has_next = len(applications_list) > APPLICATIONS_PAGE_SIZE
+        applications_list = applications_list[:APPLICATIONS_PAGE_SIZE]
+
+    page_args = request.args.to_dict()
+    prev_url = url_for("internal.applications", **{**page_args, "page": page - 1}) if page > 1 else None
+    next_url = url_for("internal.applications", **{**page_args, "page": page + 1}) if has_next else None
     jobs = JobPosting.query.order_by(JobPosting.title.asc()).all()
     jobs_by_id = {job.id: job for job in jobs}
 
@@ -342,7 +482,7 @@ def applications():
     for sid, ids in fallback_ids_by_step_id.items():
         needed_user_ids.update(ids)
 
-    users = User.query.filter(User.id.in_(list(needed_user_ids))).all() if needed_user_ids else []
+    users = User.query.filter(User.id.in_(list(needed_user_ids))).all() if applications_list else []
     users_by_id = {u.id: u for u in users}
 
     # Build next-action info per application
@@ -378,27 +518,44 @@ def applications():
             "step_type": step.step_type if step else None,
         }
 
-    # Notification previews per application (unread only)
+    # Unread notifications grouped per application: total unread count + latest timestamp per app
+    unread_groups = (
+        db.session.query(Notification.application_id, func.count(Notification.id), func.max(Notification.created_at))
+        .filter(Notification.user_id == user_id, Notification.seen_at.is_(None))
+        .group_by(Notification.application_id)
+        .all()
+    )
+    unread_count = sum(int(cnt or 0) for _app_id, cnt, _latest in unread_groups)
+
+    # Notification previews per application (latest unread only), joined back on (application_id, created_at)
     notif_preview_by_app_id = {}
-    if app_ids:
-        notif_rows = (
-            Notification.query.filter(
-                Notification.user_id == current_user().id,
+    app_id_set = set(app_ids)
+    preview_app_ids = [app_id for app_id, _cnt, _latest in unread_groups if app_id in app_id_set]
+    if preview_app_ids:
+        latest_sq = (
+            select(Notification.application_id, func.max(Notification.created_at).label("latest_at"))
+            .where(
+                Notification.user_id == user_id,
                 Notification.seen_at.is_(None),
-                Notification.application_id.in_(app_ids),
+                Notification.application_id.in_(preview_app_ids),
+            )
+            .group_by(Notification.application_id)
+            .subquery()
+        )
+        notif_rows = (
+            Notification.query.join(
+                latest_sq,
+                and_(
+                    Notification.application_id == latest_sq.c.application_id,
+                    Notification.created_at == latest_sq.c.latest_at,
+                ),
             )
-            .order_by(Notification.created_at.desc())
+            .filter(Notification.user_id == user_id, Notification.seen_at.is_(None))
+            .order_by(Notification.id.desc())
             .all()
         )
         for n in notif_rows:
-            if n.application_id not in notif_preview_by_app_id:
-                notif_preview_by_app_id[n.application_id] = n
-
-    # Get unread notifications count
-    unread_count = Notification.query.filter_by(
-        user_id=current_user().id,
-        seen_at=None
-    ).count()
+            notif_preview_by_app_id.setdefault(n.application_id, n)
 
     # Use timezone-aware UTC for consistent datetime math across SQLite/PostgreSQL
     now = datetime.now(timezone.utc)
@@ -424,32 +581,143 @@ def applications():
         next_actions=next_actions,
         notif_preview_by_app_id=notif_preview_by_app_id,
         status_meta=STATUS_META,
+        status_badge_html=STATUS_BADGE_HTML,
         current_user=current_user(),
         unread_notifications=unread_count,
         tab_counts=tab_counts,
         active_tab=tab,
         days_old_by_app_id=days_old_by_app_id,
+        page=page,
+        prev_url=prev_url,
+        next_url=next_url,
         now=now,
     )
 
 
+def _timeline_query(application_id: int):
+    """
+    One UNION ALL over every timeline source, newest first.
+    Columns: ts, type, label, detail, text, result, actor_id, actor, data.
+    """
+
+    def _null(type_):
+        return cast(null(), type_)
+
+    # Templates expect naive UTC. PostgreSQL returns timestamptz as aware datetimes, so convert
+    # in the SELECT; SQLite already stores/returns naive UTC values.
+    to_naive_utc = db.session.get_bind().dialect.name == "postgresql"
+
+    def _ts(column):
+        return func.timezone("UTC", column, type_=db.DateTime) if to_naive_utc else column
+
+    uploads = select(
+        _ts(Attachment.created_at).label("ts"),
+        literal(0).label("src"),
+        literal("upload").label("type"),
+        Attachment.file_name.label("label"),
+        Attachment.document_type.label("detail"),
+        _null(db.Text).label("text"),
+        _null(db.String).label("result"),
+        _null(db.Integer).label("actor_id"),
+        Attachment.uploaded_by.label("actor"),
+        _null(db.JSON).label("data"),
+    ).where(Attachment.application_id == application_id)
+    notes = select(
+        _ts(Note.created_at),
+        literal(1),
+        literal("note"),
+        _null(db.String),
+        _null(db.String),
+        Note.text,
+        _null(db.String),
+        Note.author_user_id,
+        _null(db.String),
+        _null(db.JSON),
+    ).where(Note.application_id == application_id)
+    doc_updates = (
+        select(
+            _ts(ApplicationDocumentStatus.updated_at),
+            literal(2),
+            literal("doc"),
+            func.coalesce(JobDocumentNode.title, "#" + cast(ApplicationDocumentStatus.node_id, db.String)),
+            _null(db.String),
+            ApplicationDocumentStatus.comment,
+            ApplicationDocumentStatus.status,
+            ApplicationDocumentStatus.updated_by_user_id,
+            _null(db.String),
+            _null(db.JSON),
+        )
+        .outerjoin(JobDocumentNode, JobDocumentNode.id == ApplicationDocumentStatus.node_id)
+        .where(ApplicationDocumentStatus.application_id == application_id)
+    )
+    doc_links = (
+        select(
+            _ts(AttachmentDocumentLink.linked_at),
+            literal(3),
+            literal("link"),
+            Attachment.file_name,
+            func.coalesce(JobDocumentNode.title, "#" + cast(AttachmentDocumentLink.node_id, db.String)),
+            _null(db.Text),
+            _null(db.String),
+            AttachmentDocumentLink.linked_by_user_id,
+            _null(db.String),
+            _null(db.JSON),
+        )
+        .join(Attachment, Attachment.id == AttachmentDocumentLink.attachment_id)
+        .outerjoin(JobDocumentNode, JobDocumentNode.id == AttachmentDocumentLink.node_id)
+        .where(Attachment.application_id == application_id)
+    )
+    completed_steps = (
+        select(
+            _ts(ApplicationStepInstance.completed_at),
+            literal(4),
+            literal("step"),
+            WorkflowStep.name,
+            _null(db.String),
+            _null(db.Text),
+            _null(db.String),
+            ApplicationStepInstance.completed_by_user_id,
+            _null(db.String),
+            ApplicationStepInstance.data_json,
+        )
+        .join(WorkflowStep, WorkflowStep.id == ApplicationStepInstance.step_id)
+        .where(
+            ApplicationStepInstance.application_id == application_id,
+            ApplicationStepInstance.completed_at.isnot(None),
+        )
+    )
+    timeline = union_all(uploads, notes, doc_updates, doc_links, completed_steps).subquery("timeline")
+    return select(timeline).order_by(timeline.c.ts.desc(), timeline.c.src.asc())
+
+
 @internal.get("/applications/<int:application_id>")
 @login_required
 def application_detail(application_id: int):
-    application = db.session.get(Application, application_id)
+    # Eager-load everything the detail page touches (candidate, job, attachments, notes, steps + fallbacks)
+    application = (
+        db.session.query(Application)
+        .options(
+            joinedload(Application.candidate),
+            joinedload(Application.job),
+            selectinload(Application.attachments),
+            selectinload(Application.notes),
+            selectinload(Application.step_instances)
+            .joinedload(ApplicationStepInstance.step)
+            .selectinload(WorkflowStep.fallback_users),
+        )
+        .filter(Application.id == application_id)
+        .first()
+    )
     if not application:
         return render_template("internal_application_detail.html", application=None), 404
 
-    candidate = db.session.get(Candidate, application.candidate_id)
-    job = db.session.get(JobPosting, application.job_id)
-    attachments = Attachment.query.filter_by(application_id=application.id).all()
-    notes = Note.query.filter_by(application_id=application.id).order_by(Note.created_at.desc()).all()
-    steps = (
-        db.session.query(ApplicationStepInstance, WorkflowStep)
-        .join(WorkflowStep, WorkflowStep.id == ApplicationStepInstance.step_id)
-        .filter(ApplicationStepInstance.application_id == application.id)
-        .order_by(WorkflowStep.step_order.asc())
-        .all()
+    candidate = application.candidate
+    job = application.job
+    attachments = list(application.attachments)
+    notes = list(application.notes)
+    steps = sorted(
+        ((inst, inst.step) for inst in application.step_instances if inst.step),
+        key=lambda row: (row[1].step_order, row[0].id),
     )
     all_users = User.query.order_by(User.email.asc()).all()
     users_by_id = {u.id: u for u in all_users}
@@ -473,18 +741,24 @@ def application_detail(application_id: int):
     doc_roots = children_by_parent_id.get(None, [])
     statuses = ApplicationDocumentStatus.query.filter_by(application_id=application.id).all()
     status_by_node_id = {s.node_id: s for s in statuses}
-    links = (
-        db.session.query(AttachmentDocumentLink, Attachment)
+    # Only the (node, attachment) pairs are needed; the attachments themselves are already loaded
+    attachments_by_id = {att.id: att for att in attachments}
+    link_rows = db.session.execute(
+        select(AttachmentDocumentLink.node_id, AttachmentDocumentLink.attachment_id)
         .join(Attachment, Attachment.id == AttachmentDocumentLink.attachment_id)
-        .filter(Attachment.application_id == application.id)
-        .all()
-    )
+        .where(Attachment.application_id == application.id)
+    ).all()
     linked_attachments_by_node_id = {}
-    for _link, att in links:
-        linked_attachments_by_node_id.setdefault(_link.node_id, []).append(att)
-
-    doccheck_instance, doccheck_step = _get_doccheck_step(application)
-    can_doccheck = _doc_step_allowed(application)
+    for node_id, attachment_id in link_rows:
+        att = attachments_by_id.get(attachment_id)
+        if att is not None:
+            linked_attachments_by_node_id.setdefault(node_id, []).append(att)
+
+    doccheck_instance, doccheck_step = next(
+        ((inst, step) for inst, step in steps if inst.state == "open" and step.step_type == "unterlagen_check"),
+        (None, None),
+    )
+    can_doccheck = _doc_step_allowed(application, (doccheck_instance, doccheck_step))
     doc_items = [n for n in doc_nodes if n.kind == "item"]
     status_by_node = {s.node_id: s.status for s in statuses}
     required_total = sum(1 for n in doc_items if n.required)
@@ -492,92 +766,57 @@ def application_detail(application_id: int):
     missing = sum(1 for n in doc_items if status_by_node.get(n.id, "missing") == "missing" and n.required)
     wrong = sum(1 for n in doc_items if status_by_node.get(n.id) == "wrong")
 
-    doc_nodes_by_id = {n.id: n for n in doc_nodes}
-
-    def _email_for_user_id(user_id: int | None) -> str | None:
-        if not user_id:
-            return None
-        u = users_by_id.get(int(user_id))
-        return u.email if u else None
+    email_by_id = {uid: u.email for uid, u in users_by_id.items()}
 
-    # Unified timeline (notes + uploads + doc updates + linking + completed steps)
+    # Unified timeline (notes + uploads + doc updates + linking + completed steps), sorted by the DB
+    candidate_label = candidate.email if candidate and candidate.email else "Bewerber"
     timeline = []
-
-    # Uploads (usually by candidate)
-    for att in attachments:
-        uploader = (att.uploaded_by or "").strip().lower()
-        if uploader == "candidate":
-            actor = candidate.email if candidate and candidate.email else "Bewerber"
-        else:
-            actor = att.uploaded_by or "System"
-
-        timeline.append(
-            {
-                "ts": _naive_utc(att.created_at),
-                "type": "upload",
-                "title": f"Upload: {att.file_name or 'Datei'}",
-                "text": f"Typ: {att.document_type}" if att.document_type else None,
+    for row in db.session.execute(_timeline_query(application.id)):
+        if row.type == "upload":
+            if (row.actor or "").strip().lower() == "candidate":
+                actor = candidate_label
+            else:
+                actor = row.actor or "System"
+            entry = {
+                "title": f"Upload: {row.label or 'Datei'}",
+                "text": f"Typ: {row.detail}" if row.detail else None,
                 "actor": actor,
             }
-        )
-
-    # Notes (manual + system notes)
-    for note in notes:
-        timeline.append(
-            {
-                "ts": _naive_utc(note.created_at),
-                "type": "note",
+        elif row.type == "note":
+            entry = {
                 "title": "Notiz",
-                "text": note.text,
-                "actor": _email_for_user_id(note.author_user_id) or "System",
+                "text": row.text,
+                "actor": email_by_id.get(row.actor_id) or "System",
             }
-        )
-
-    # Unterlagen-Check status updates (latest only per doc item)
-    for s in statuses:
-        node = doc_nodes_by_id.get(s.node_id)
-        node_title = node.title if node else f"#{s.node_id}"
-        timeline.append(
-            {
-                "ts": _naive_utc(s.updated_at),
-                "type": "doc",
-                "title": f"Unterlagenstatus: {node_title}",
-                "text": s.comment,
-                "result": s.status,
-                "actor": _email_for_user_id(s.updated_by_user_id) or "System",
+        elif row.type == "doc":
+            entry = {
+                "title": f"Unterlagenstatus: {row.label}",
+                "text": row.text,
+                "result": row.result,
+                "actor": email_by_id.get(row.actor_id) or "System",
             }
-        )
-
-    # Attachment-to-doc linking actions
-    for link_row, att in links:
-        node = doc_nodes_by_id.get(link_row.node_id)
-        node_title = node.title if node else f"#{link_row.node_id}"
-        timeline.append(
-            {
-                "ts": _naive_utc(link_row.linked_at),
-                "type": "link",
+        elif row.type == "link":
+            entry = {
                 "title": "Dokument zugeordnet",
-                "text": f"{att.file_name or 'Datei'} → {node_title}",
-                "actor": _email_for_user_id(link_row.linked_by_user_id) or "System",
+                "text": f"{row.label or 'Datei'} → {row.detail}",
+                "actor": email_by_id.get(row.actor_id) or "System",
             }
-        )
-
-    # Completed steps
-    for inst, step in steps:
-        if inst.completed_at:
-            timeline.append(
-                {
-                    "ts": _naive_utc(inst.completed_at),
-                    "type": "step",
-                    "title": f"Step abgeschlossen: {step.name}",
-                    "text": (inst.data_json or {}).get("comment") if inst.data_json else None,
-                    "result": (inst.data_json or {}).get("result") if inst.data_json else None,
-                    "actor": _email_for_user_id(inst.completed_by_user_id) or "Unbekannt",
-                }
-            )
-
-    timeline.sort(key=lambda e: e["ts"] or datetime.min, reverse=True)
-
+        else:
+            data = row.data or {}
+            entry = {
+                "title": f"Step abgeschlossen: {row.label}",
+                "text": data.get("comment") if data else None,
+                "result": data.get("result") if data else None,
+                "actor": email_by_id.get(row.actor_id) or "Unbekannt",
+            }
+        entry["ts"] = row.ts
+        entry["type"] = row.type
+        timeline.append(entry)
+
+    # The active step is already loaded above; seed the per-request cache so this check does not re-query it
+    active_step = next((step for inst, step in steps if inst.id == application.current_step_id), None)
+    active_ids = set(active_step.allowed_user_ids) if active_step else set()
+    g.setdefault("_allowed_ids_cache", {}).setdefault(application.id, active_ids)
     can_manage = _can_manage_application(application)
 
     return render_template(
@@ -647,11 +886,13 @@ def _get_doccheck_step(application: Application):
     return row[0], row[1]
 
 
-def _doc_step_allowed(application: Application) -> bool:
+@_rbac_memo
+def _doc_step_allowed(application: Application, doccheck: tuple | None = None) -> bool:
     """
     Step-based permission for doc review/request actions:
     - admin always allowed
     - allowed if user is owner_user_id or in fallback_users of that workflow step
+    `doccheck` may pass an already resolved (instance, step) pair to skip the lookup.
     """
     u = current_user()
     if not u:
@@ -661,17 +902,11 @@ def _doc_step_allowed(application: Application) -> bool:
     if u.role == "viewer":
         return False
 
-    inst, step = _get_doccheck_step(application)
+    inst, step = doccheck if doccheck is not None else _get_doccheck_step(application)
     if not inst or not step:
         return False
 
-    allowed_ids = set()
-    if step.owner_user_id:
-        allowed_ids.add(step.owner_user_id)
-    fallbacks = list(getattr(step, "fallback_users", []) or [])
-    allowed_ids.update([x.id for x in fallbacks])
-
-    return u.id in allowed_ids
+    return u.id in step.allowed_user_ids
 
 
 @internal.post("/applications/<int:application_id>/docs/<int:node_id>/status")
@@ -737,17 +972,18 @@ def link_attachment_to_doc(application_id: int, node_id: int):
     if not node or node.job_id != application.job_id or node.kind != "item":
         return redirect(url_for("internal.application_detail", application_id=application_id))
 
-    existing = AttachmentDocumentLink.query.filter_by(attachment_id=attachment_id, node_id=node_id).first()
-    if not existing:
-        db.session.add(
-            AttachmentDocumentLink(
-                attachment_id=attachment_id,
-                node_id=node_id,
-                linked_by_user_id=current_user().id,
-                linked_at=datetime.now(timezone.utc),
-            )
-        )
-        db.session.commit()
+    # No-op if the attachment is already linked to this item
+    insert_document_links(
+        [
+            {
+                "attachment_id": attachment_id,
+                "node_id": node_id,
+                "linked_by_user_id": current_user().id,
+                "linked_at": datetime.now(timezone.utc),
+            }
+        ]
+    )
+    db.session.commit()
     return redirect(url_for("internal.application_detail", application_id=application_id))
 
 
@@ -809,27 +1045,25 @@ def request_missing_docs(application_id: int):
             if st in {"missing", "wrong"} and n.required:
                 missing_items.append(f"{(n.code + ' ') if n.code else ''}{n.title}")
 
+    # Read before committing: commits expire loaded rows and the mail would reload them
+    candidate_email, candidate_name = candidate.email, candidate.name
     token = issue_magic_link(application_id, scope="upload_documents")
     link = public_url_for("magic_links.upload_page", token=token)
-    send_magic_link(
-        candidate.email,
+
+    db.session.execute(
+        update(Application).where(Application.id == application_id).values(status="waiting_on_candidate")
+    )
+    _add_system_note(application_id, f"Unterlagen angefordert ({len(missing_items)} fehlend).")
+    db.session.commit()
+    send_in_background(
+        send_magic_link,
+        candidate_email,
         link,
-        candidate_name=candidate.name,
+        candidate_name=candidate_name,
         missing_items=missing_items,
         message=message,
     )
 
-    application.status = "waiting_on_candidate"
-    db.session.add(application)
-    db.session.add(
-        Note(
-            application_id=application.id,
-            author_user_id=current_user().id,
-            text=f"Unterlagen angefordert ({len(missing_items)} fehlend).",
-        )
-    )
-    db.session.commit()
-
     return redirect(url_for("internal.application_detail", application_id=application_id))
 
 
@@ -859,22 +1093,26 @@ def complete_step(application_id: int, instance_id: int):
     denied = _deny_if_viewer(application_id)
     if denied:
         return denied
-    instance = db.session.get(ApplicationStepInstance, instance_id)
-    if not instance or instance.application_id != application_id:
-        return redirect(url_for("internal.application_detail", application_id=application_id))
-
-    # Load step for RBAC + business rules
-    step = db.session.get(WorkflowStep, instance.step_id)
+    user = current_user()
+    is_admin = user.role == "admin"
+    detail_url = url_for("internal.application_detail", application_id=application_id)
+
+    # Instance, step (+ fallback users, for RBAC) and application (+ candidate) in one round trip
+    row = db.session.execute(
+        select(ApplicationStepInstance, WorkflowStep, Application)
+        .join(Application, Application.id == ApplicationStepInstance.application_id)
+        .outerjoin(WorkflowStep, WorkflowStep.id == ApplicationStepInstance.step_id)
+        .options(selectinload(WorkflowStep.fallback_users), joinedload(Application.candidate))
+        .where(ApplicationStepInstance.id == instance_id, ApplicationStepInstance.application_id == application_id)
+    ).first()
+    if not row:
+        return redirect(detail_url)
+    instance, step, application = row
 
     # RBAC: only admin or owner/fallback may complete
-    if current_user().role != "admin":
-        allowed_ids = set()
-        if step and step.owner_user_id:
-            allowed_ids.add(step.owner_user_id)
-        if step and getattr(step, "fallback_users", None):
-            allowed_ids.update([u.id for u in step.fallback_users])
-        if not step or current_user().id not in allowed_ids:
-            return redirect(url_for("internal.application_detail", application_id=application_id))
+    if not is_admin:
+        if not step or user.id not in step.allowed_user_ids:
+            return redirect(detail_url)
 
     result = (request.form.get("result") or "").strip().lower()
     comment = (request.form.get("comment") or "").strip()
@@ -885,8 +1123,7 @@ def complete_step(application_id: int, instance_id: int):
     # - Ergebnis is either 'weiter' (advance) or 'ablehnen' (terminal rejection)
     if scheduled_err:
         return redirect(
-            url_for("internal.application_detail", application_id=application_id, error=scheduled_err)
-            + "#next"
+            url_for("internal.application_detail", application_id=application_id, error=scheduled_err) + "#next"
         )
     if result not in {"weiter", "ablehnen"}:
         return redirect(
@@ -900,35 +1137,58 @@ def complete_step(application_id: int, instance_id: int):
 
     # Enforce: Unterlagen-Check can only advance when required docs are OK
     if step and step.step_type == "unterlagen_check" and result == "weiter":
-        application = db.session.get(Application, application_id)
-        if application:
-            nodes = JobDocumentNode.query.filter_by(job_id=application.job_id, kind="item").all()
-            required_ids = [n.id for n in nodes if n.required]
-            status_by_node = {
-                s.node_id: s.status
-                for s in ApplicationDocumentStatus.query.filter_by(application_id=application.id).all()
-            }
-            missing_required = sum(
-                1 for nid in required_ids if status_by_node.get(nid, "missing") == "missing"
+        # Tally required items without a status row (= missing), marked missing, or wrong in one query
+        missing_required, wrong_required = (
+            db.session.query(
+                func.coalesce(
+                    func.sum(
+                        case(
+                            (
+                                or_(
+                                    ApplicationDocumentStatus.status.is_(None),
+                                    ApplicationDocumentStatus.status == "missing",
+                                ),
+                                1,
+                            ),
+                            else_=0,
+                        )
+                    ),
+                    0,
+                ),
+                func.coalesce(func.sum(case((ApplicationDocumentStatus.status == "wrong", 1), else_=0)), 0),
             )
-            wrong_required = sum(1 for nid in required_ids if status_by_node.get(nid) == "wrong")
-            if missing_required > 0 or wrong_required > 0:
-                return redirect(
-                    url_for(
-                        "internal.application_detail",
-                        application_id=application_id,
-                        error=(
-                            f"Unterlagen-Check kann nicht weitergegeben werden: "
-                            f"Pflichtunterlagen fehlen noch ({missing_required}) oder sind falsch ({wrong_required}). "
-                            f"Bitte erst im Unterlagen-Check prüfen/zuordnen oder Unterlagen nachfordern."
-                        ),
-                    )
-                    + "#doccheck"
+            .select_from(JobDocumentNode)
+            .outerjoin(
+                ApplicationDocumentStatus,
+                and_(
+                    ApplicationDocumentStatus.node_id == JobDocumentNode.id,
+                    ApplicationDocumentStatus.application_id == application.id,
+                ),
+            )
+            .filter(
+                JobDocumentNode.job_id == application.job_id,
+                JobDocumentNode.kind == "item",
+                JobDocumentNode.required.is_(True),
+            )
+            .one()
+        )
+        if missing_required > 0 or wrong_required > 0:
+            return redirect(
+                url_for(
+                    "internal.application_detail",
+                    application_id=application_id,
+                    error=(
+                        f"Unterlagen-Check kann nicht weitergegeben werden: "
+                        f"Pflichtunterlagen fehlen noch ({missing_required}) oder sind falsch ({wrong_required}). "
+                        f"Bitte erst im Unterlagen-Check prüfen/zuordnen oder Unterlagen nachfordern."
+                    ),
                 )
+                + "#doccheck"
+            )
 
     instance.state = "done"
     instance.completed_at = datetime.now(timezone.utc)
-    instance.completed_by_user_id = current_user().id
+    instance.completed_by_user_id = user.id
     instance.data_json = {
         "result": result or None,
         "comment": comment or None,
@@ -936,11 +1196,6 @@ def complete_step(application_id: int, instance_id: int):
     }
     db.session.add(instance)
 
-    application = db.session.get(Application, application_id)
-    if not application:
-        db.session.commit()
-        return redirect(url_for("internal.application_detail", application_id=application_id))
-
     # Terminal: rejection stops the workflow
     if result == "ablehnen":
         # Close remaining open steps so UI shows a terminal state
@@ -948,18 +1203,14 @@ def complete_step(application_id: int, instance_id: int):
             {"state": "pending"},
             synchronize_session=False,
         )
-        application.current_step_id = None
-        application.status = "rejected"
-        db.session.add(application)
+        db.session.execute(
+            update(Application)
+            .where(Application.id == application_id)
+            .values(status="rejected", current_step_id=None)
+        )
 
         # Note
-        db.session.add(
-            Note(
-                application_id=application_id,
-                author_user_id=current_user().id,
-                text=f"Step abgelehnt. {comment or ''}".strip(),
-            )
-        )
+        _add_system_note(application_id, f"Step abgelehnt. {comment or ''}".strip())
 
         # Notify participants
         msg = f"Bewerbung #{application.reference_number or application.id} wurde abgelehnt."
@@ -967,23 +1218,28 @@ def complete_step(application_id: int, instance_id: int):
         _notify_users(recipients, application_id, "application_rejected", msg)
 
         # Email candidate (best-effort; logs stub if M365 not configured)
-        candidate = db.session.get(Candidate, application.candidate_id) if application.candidate_id else None
-        if candidate and candidate.email:
-            send_application_rejection(candidate.email, application.reference_number or str(application.id), reason=comment or None)
-
+        candidate_email = application.candidate.email if application.candidate else None
+        ref = application.reference_number or str(application_id)
         db.session.commit()
-        return redirect(url_for("internal.application_detail", application_id=application_id, success="Bewerbung abgelehnt.") + "#next")
+        if candidate_email:
+            send_in_background(send_application_rejection, candidate_email, ref, reason=comment or None)
+        return redirect(
+            url_for("internal.application_detail", application_id=application_id, success="Bewerbung abgelehnt.")
+            + "#next"
+        )
 
     # Result-driven transitions (complete only advances on 'weiter')
+    step_ready_batch: dict | None = None
+    # Ordered by the instance's own step_order (indexed); the step is eager-loaded for the notifications below
     next_instance = (
         db.session.query(ApplicationStepInstance)
-        .join(WorkflowStep, WorkflowStep.id == ApplicationStepInstance.step_id)
+        .options(joinedload(ApplicationStepInstance.step).selectinload(WorkflowStep.fallback_users))
         .filter(
             ApplicationStepInstance.application_id == application_id,
             ApplicationStepInstance.id != instance.id,
             ApplicationStepInstance.state == "open",
         )
-        .order_by(WorkflowStep.step_order.asc())
+        .order_by(ApplicationStepInstance.step_order.asc(), ApplicationStepInstance.id.asc())
         .first()
     )
     if next_instance:
@@ -991,54 +1247,44 @@ def complete_step(application_id: int, instance_id: int):
         application.status = "in_progress"
         
         # Assign + notify next owner (user or fallback users)
-        step = db.session.get(WorkflowStep, next_instance.step_id)
+        step = next_instance.step
         if step:
-            # Email recipients: next owner/fallback + admins
+            # Email recipients: next owner/fallback (admins are added in the email query below)
             step_notify_user_ids: set[int] = set()
-            admin_ids = db.session.query(User.id).filter(User.role == "admin").all()
-            step_notify_user_ids.update([int(x[0]) for x in admin_ids if x and x[0]])
 
             if step.owner_user_id:
                 step_notify_user_ids.add(int(step.owner_user_id))
-                db.session.add(
-                    Notification(
-                        user_id=step.owner_user_id,
-                        application_id=application_id,
-                        type="step_ready",
-                        message=f"Step '{step.name}' ist bereit für Bewerbung #{application.reference_number or application.id}",
-                    )
-                )
             else:
-                fallbacks = list(getattr(step, "fallback_users", []) or [])
-                for user in fallbacks:
-                    step_notify_user_ids.add(int(user.id))
-                    db.session.add(
-                        Notification(
-                            user_id=user.id,
-                            application_id=application_id,
-                            type="step_ready",
-                            message=f"Step '{step.name}' ist bereit für Bewerbung #{application.reference_number or application.id}",
-                        )
-                    )
+                step_notify_user_ids.update(int(fallback.id) for fallback in (step.fallback_users or []))
+            _notify_users(
+                step_notify_user_ids,
+                application_id,
+                "step_ready",
+                f"Step '{step.name}' ist bereit für Bewerbung #{application.reference_number or application.id}",
+            )
 
             # Email alerts (best-effort; never block step completion)
             try:
                 ref = application.reference_number or str(application.id)
-                application_url = url_for("internal.application_detail", application_id=application.id, _external=True)
-                completed_by = current_user()
-                completed_by_email = completed_by.email if completed_by else None
-                if step_notify_user_ids:
-                    users = User.query.filter(User.id.in_(list(step_notify_user_ids))).all()
-                    for u in users:
-                        if not u.email:
-                            continue
-                        send_step_ready_notification(
-                            to_email=u.email,
-                            step_name=step.name,
-                            reference_number=ref,
-                            application_url=application_url,
-                            completed_by_email=completed_by_email,
-                        )
+                application_url = url_for(
+                    "internal.application_detail", application_id=application_id, _external=True
+                )
+                completed_by_email = user.email
+                # One query for admins + next owner/fallbacks (email column only)
+                recipient_emails = db.session.execute(
+                    select(User.email).where(
+                        or_(User.role == "admin", User.id.in_(list(step_notify_user_ids))),
+                        User.email.is_not(None),
+                    )
+                ).scalars().all()
+                if recipient_emails:
+                    step_ready_batch = {
+                        "to_emails": recipient_emails,
+                        "step_name": step.name,
+                        "reference_number": ref,
+                        "application_url": application_url,
+                        "completed_by_email": completed_by_email,
+                    }
             except Exception:
                 try:
                     current_app.logger.warning("Step-ready email notify failed", exc_info=True)
@@ -1049,8 +1295,11 @@ def complete_step(application_id: int, instance_id: int):
         application.status = "completed"
     db.session.add(application)
     db.session.commit()
+    if step_ready_batch:
+        # Whole fan-out is one background job
+        send_in_background(send_step_ready_notifications, **step_ready_batch)
 
-    return redirect(url_for("internal.application_detail", application_id=application_id))
+    return redirect(detail_url)
 
 
 @internal.post("/applications/<int:application_id>/steps/<int:instance_id>/save")
@@ -1066,21 +1315,19 @@ def save_step(application_id: int, instance_id: int):
     - Step stays open; application may move to waiting_on_candidate.
     - Only on 'complete' does the step finish and (on 'weiter') moves to next step.
     """
+    user = current_user()
+    is_admin = user.role == "admin"
+
     instance = db.session.get(ApplicationStepInstance, instance_id)
     if not instance or instance.application_id != application_id:
         return redirect(url_for("internal.application_detail", application_id=application_id))
     
     # Load step (for RBAC + nicer audit notes)
-    step = db.session.get(WorkflowStep, instance.step_id)
+    step = _get_step_with_fallbacks(instance.step_id)
 
     # RBAC: only admin or owner/fallback may save
-    if current_user().role != "admin":
-        allowed_ids = set()
-        if step and step.owner_user_id:
-            allowed_ids.add(step.owner_user_id)
-        if step and getattr(step, "fallback_users", None):
-            allowed_ids.update([u.id for u in step.fallback_users])
-        if not step or current_user().id not in allowed_ids:
+    if not is_admin:
+        if not step or user.id not in step.allowed_user_ids:
             return redirect(url_for("internal.application_detail", application_id=application_id))
 
     scheduled_at, scheduled_err = _normalize_scheduled_at(request.form.get("scheduled_at"))
@@ -1114,13 +1361,7 @@ def save_step(application_id: int, instance_id: int):
         )
         if data.get("comment"):
             note_text += f"; Kommentar: {data.get('comment')}"
-        db.session.add(
-            Note(
-                application_id=application_id,
-                author_user_id=current_user().id,
-                text=note_text,
-            )
-        )
+        _add_system_note(application_id, note_text)
 
     db.session.commit()
     return redirect(
@@ -1148,12 +1389,15 @@ def request_documents(application_id: int):
     if not candidate or not candidate.email:
         return redirect(url_for("internal.application_detail", application_id=application_id))
 
+    # Read before committing: commits expire loaded rows and the mail would reload them
+    candidate_email, candidate_name = candidate.email, candidate.name
     token = issue_magic_link(application_id, scope="upload_documents")
     link = public_url_for("magic_links.upload_page", token=token)
-    send_magic_link(candidate.email, link, candidate_name=candidate.name)
-    application.status = "waiting_on_candidate"
-    db.session.add(application)
+    db.session.execute(
+        update(Application).where(Application.id == application_id).values(status="waiting_on_candidate")
+    )
     db.session.commit()
+    send_in_background(send_magic_link, candidate_email, link, candidate_name=candidate_name)
     return redirect(url_for("internal.application_detail", application_id=application_id))
 
 
@@ -1196,7 +1440,7 @@ def resend_magic_link_internal(application_id: int):
 
     token = issue_magic_link(application_id, scope="upload_documents")
     link = public_url_for("magic_links.upload_page", token=token)
-    send_magic_link(candidate.email, link, candidate_name=candidate.name)
+    send_in_background(send_magic_link, candidate.email, link, candidate_name=candidate.name)
     return redirect(url_for("internal.application_detail", application_id=application_id))
 
 
@@ -1217,14 +1461,35 @@ def download_attachment(application_id: int, attachment_id: int):
         except Exception:
             return "File not found on server", 404
 
-    if not os.path.exists(file_path):
-        return "File not found on server", 404
+    download_name = attachment.file_name or "attachment"
 
-    return send_file(
-        file_path,
-        as_attachment=True,
-        download_name=attachment.file_name or "attachment",
-    )
+    # Behind nginx: hand the transfer to the proxy instead of streaming it through the worker
+    accel_prefix = current_app.config.get("X_ACCEL_REDIRECT_PREFIX") or ""
+    rel_path = uploads_relative_path(file_path) if accel_prefix else None
+    if rel_path:
+        # werkzeug builds the same headers as send_file (Content-Type guessed from the name when
+        # file_type is unset, RFC 5987 Content-Disposition), with an X-Sendfile header instead of a body
+        try:
+            response = werkzeug_send_file(
+                file_path,
+                request.environ,
+                mimetype=attachment.file_type or None,
+                as_attachment=True,
+                download_name=download_name,
+                use_x_sendfile=True,
+                response_class=current_app.response_class,
+            )
+        except FileNotFoundError:
+            return "File not found on server", 404
+        del response.headers["X-Sendfile"]
+        response.headers["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + quote(rel_path)
+        return response
+
+    # send_file stats the file anyway, so a missing file is handled here instead of a separate exists() call
+    try:
+        return send_file(file_path, as_attachment=True, download_name=download_name)
+    except FileNotFoundError:
+        return "File not found on server", 404
 
 
 @internal.post("/applications/<int:application_id>/reject")
@@ -1246,29 +1511,25 @@ def reject_application(application_id: int):
         {"state": "pending"},
         synchronize_session=False,
     )
-    application.current_step_id = None
-    application.status = "rejected"
+    db.session.execute(
+        update(Application).where(Application.id == application_id).values(status="rejected", current_step_id=None)
+    )
 
     # Add note
-    note = Note(
-        application_id=application_id,
-        author_user_id=current_user().id,
-        text=f"Bewerbung abgelehnt. Grund: {reason or 'Kein Grund angegeben'}",
-    )
-    db.session.add(note)
+    _add_system_note(application_id, f"Bewerbung abgelehnt. Grund: {reason or 'Kein Grund angegeben'}")
 
     # Notify participants
     msg = f"Bewerbung #{application.reference_number or application.id} wurde abgelehnt."
     recipients = _participant_user_ids_for_application(application)
     _notify_users(recipients, application_id, "application_rejected", msg)
 
-    # Email candidate (best-effort)
+    # Email candidate (best-effort); values are read before the commit expires the rows
     candidate = db.session.get(Candidate, application.candidate_id) if application.candidate_id else None
-    if candidate and candidate.email:
-        send_application_rejection(candidate.email, application.reference_number or str(application.id), reason=reason or None)
-
-    db.session.add(application)
+    candidate_email = candidate.email if candidate else None
+    ref = application.reference_number or str(application_id)
     db.session.commit()
+    if candidate_email:
+        send_in_background(send_application_rejection, candidate_email, ref, reason=reason or None)
 
     return redirect(url_for("internal.application_detail", application_id=application_id))
 
@@ -1285,16 +1546,8 @@ def accept_application(application_id: int):
     if not _can_manage_application(application):
         return redirect(url_for("internal.application_detail", application_id=application_id))
 
-    application.status = "accepted"
-    db.session.commit()
-
-    # Add note
-    note = Note(
-        application_id=application_id,
-        author_user_id=current_user().id,
-        text="Bewerbung angenommen.",
-    )
-    db.session.add(note)
+    db.session.execute(update(Application).where(Application.id == application_id).values(status="accepted"))
+    _add_system_note(application_id, "Bewerbung angenommen.")
     db.session.commit()
 
     return redirect(url_for("internal.application_detail", application_id=application_id))
@@ -1304,11 +1557,16 @@ def accept_application(application_id: int):
 @login_required
 def notifications():
     only_unread = request.args.get("unread") == "1"
-    q = Notification.query.filter_by(user_id=current_user().id)
+    # The unread total rides along as a window aggregate (evaluated before LIMIT) instead of a second COUNT
+    unread_total = func.count().filter(Notification.seen_at.is_(None)).over().label("unread_total")
+    stmt = select(Notification, unread_total).where(Notification.user_id == current_user().id)
     if only_unread:
-        q = q.filter(Notification.seen_at.is_(None))
-    notifications_list = q.order_by(Notification.created_at.desc()).limit(100).all()
-    unread_count = Notification.query.filter_by(user_id=current_user().id, seen_at=None).count()
+        stmt = stmt.where(Notification.seen_at.is_(None))
+    rows = db.session.execute(stmt.order_by(Notification.created_at.desc()).limit(100)).all()
+    notifications_list = [row[0] for row in rows]
+    unread_count = rows[0].unread_total if rows else 0
+    # Reused by the layout's unread badge (inject_user)
+    g._unread_notifications = unread_count
     return render_template(
         "internal/notifications.html",
         notifications=notifications_list,
@@ -1320,10 +1578,15 @@ def notifications():
 @internal.post("/notifications/mark-all-read")
 @login_required
 def mark_all_notifications_read():
-    Notification.query.filter_by(user_id=current_user().id, seen_at=None).update(
-        {"seen_at": datetime.now(timezone.utc)}
-    )
-    db.session.commit()
+    # Served by the partial unread index; nothing to commit when there was nothing unread
+    marked = db.session.execute(
+        update(Notification)
+        .where(Notification.user_id == current_user().id, Notification.seen_at.is_(None))
+        .values(seen_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if marked:
+        db.session.commit()
     return redirect(url_for("internal.notifications"))
 
 
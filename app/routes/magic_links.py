@@ -1,9 +1,14 @@
-from datetime import datetime, timezone
+import hashlib
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 
 from flask import Blueprint, current_app, jsonify, make_response, render_template, request, url_for
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.orm import joinedload
 
 from ..auth_utils import api_login_required, current_user
-from ..email import send_candidate_upload_notification, send_magic_link
+from ..email import send_candidate_upload_notifications, send_in_background, send_magic_link
 from ..extensions import csrf, db, limiter
 from ..models import (
     Application,
@@ -12,14 +17,13 @@ from ..models import (
     AttachmentDocumentLink,
     Candidate,
     JobDocumentNode,
-    JobPosting,
-    MagicLinkToken,
     Notification,
     User,
+    insert_document_links,
 )
 from ..security import (
     ensure_utc_aware,
-    hash_token,
+    find_magic_link_token,
     increment_fail,
     is_token_locked,
     issue_magic_link,
@@ -28,24 +32,114 @@ from ..security import (
     utcnow,
 )
 from ..supabase import SupabaseAPIError
-from ..storage import delete_file, filestorage_size_bytes, save_file
+from ..storage import delete_file, filestorage_size_bytes, save_files
 from ..url_utils import public_url_for
 
 magic_links = Blueprint("magic_links", __name__)
 
+_DOC_TYPES = frozenset({"cv", "cover_letter", "certificate", "other"})
+
+# Newest uploads shown in the candidate's "uploaded files" list (matches the default per-application cap)
+_UPLOADED_FILES_LIST_LIMIT = 50
+
+# Upload-page data per (application, checklist revision), kept briefly in-process; see upload_page
+_UPLOAD_PAGE_CACHE_SECONDS = 60
+_UPLOAD_PAGE_CACHE_MAX_ENTRIES = 1024
+_upload_page_cache: dict[tuple, tuple[float, dict]] = {}
+
+
+@dataclass(frozen=True)
+class _UploadSettings:
+    """Magic-link scope and upload limits, read from app config once per app."""
+
+    scope: str
+    max_request_bytes: int | None
+    max_files_per_request: int
+    max_files_per_app: int
+    max_total_bytes_per_app: int
+    max_pdf: int
+    max_img: int
+    allowed_types: frozenset[str]
+    email_throttle_minutes: int
+
+    @classmethod
+    def from_config(cls, config) -> "_UploadSettings":
+        try:
+            max_request_bytes = int(
+                config.get("UPLOAD_MAX_BYTES_MAGIC_LINK") or config.get("MAX_CONTENT_LENGTH") or 0
+            ) or None
+        except (TypeError, ValueError):
+            max_request_bytes = None
+        return cls(
+            scope=config["MAGIC_LINK_SCOPE_UPLOAD"],
+            max_request_bytes=max_request_bytes,
+            max_files_per_request=int(config.get("UPLOAD_MAX_FILES_PER_REQUEST") or 10),
+            max_files_per_app=int(config.get("UPLOAD_MAX_FILES_PER_APPLICATION") or 50),
+            max_total_bytes_per_app=int(config.get("UPLOAD_MAX_TOTAL_BYTES_PER_APPLICATION") or 0),
+            max_pdf=int(config.get("UPLOAD_MAX_FILE_BYTES_PDF") or 0),
+            max_img=int(config.get("UPLOAD_MAX_FILE_BYTES_IMAGE") or 0),
+            allowed_types=frozenset(config.get("ALLOWED_MIME_TYPES") or ()),
+            email_throttle_minutes=int(config.get("CANDIDATE_UPLOAD_EMAIL_THROTTLE_MINUTES") or 30),
+        )
+
+    def max_for_mime(self, mime: str) -> int | None:
+        if not mime:
+            return None
+        if mime == "application/pdf":
+            return self.max_pdf or None
+        if mime.startswith("image/"):
+            return self.max_img or None
+        return None
+
+
+_SETTINGS_EXTENSION_KEY = "magic_links_upload_settings"
+
+
+@magic_links.record_once
+def _cache_upload_settings(state) -> None:
+    state.app.extensions[_SETTINGS_EXTENSION_KEY] = _UploadSettings.from_config(state.app.config)
+
+
+def _settings() -> _UploadSettings:
+    app = current_app._get_current_object()  # resolve the proxy once
+    # In debug mode re-read config per request so edits made after startup take effect
+    if app.debug:
+        return _UploadSettings.from_config(app.config)
+    return app.extensions[_SETTINGS_EXTENSION_KEY]
+
+
+def _token_rate_limit_key() -> str:
+    """
+    Rate-limit bucket per magic link, on top of the per-IP limits: caps how hard a single
+    (leaked or shared) link can be hit from many addresses. Hashed so the limiter storage
+    never holds usable token material.
+    """
+    token = (request.view_args or {}).get("token") or ""
+    return "ml:" + hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+
+def _file_validation_error(files: list, sizes: list[int | None], settings: _UploadSettings):
+    """JSON error response for the first file with a disallowed type or over its size limit, else None."""
+    for file, size in zip(files, sizes):
+        if file.mimetype not in settings.allowed_types:
+            return jsonify({"error": "invalid_file_type"}), 400
+        limit = settings.max_for_mime(file.mimetype)
+        if size is not None and limit and size > limit:
+            return jsonify({"error": "file_too_large", "maxBytes": limit}), 400
+    return None
+
 
 def _resolve_token(token: str, scope: str, check_locked: bool = True):
     """
     Resolve and validate a magic link token.
 
     Security features:
-    - Cryptographic hash comparison (timing-safe via HMAC)
+    - Lookup by keyed hash of the token (the raw token is never stored)
     - Expiry check
     - Revocation check
     - Brute-force protection (auto-lock after too many failures)
     """
-    token_hash = hash_token(token)
-    record = MagicLinkToken.query.filter_by(token_hash=token_hash, scope=scope).first()
+    record = find_magic_link_token(token, scope)
 
     if record is None:
         return None, "invalid"
@@ -66,6 +160,166 @@ def _resolve_token(token: str, scope: str, check_locked: bool = True):
     return record, None
 
 
+def _uploaded_files_payload(application_id: int) -> list[dict]:
+    """The candidate's uploaded-files list (newest first) without the checklist around it."""
+    rows = db.session.execute(
+        select(Attachment.id, Attachment.file_name, Attachment.document_type, Attachment.uploaded_by)
+        .where(Attachment.application_id == application_id)
+        .order_by(Attachment.id.desc())
+        .limit(_UPLOADED_FILES_LIST_LIMIT)
+    ).all()
+    return [
+        {
+            "id": row.id,
+            "name": row.file_name or "Datei",
+            "type": row.document_type,
+            "uploaded_by": row.uploaded_by,
+        }
+        for row in rows
+    ]
+
+
+def _checklist_revision(application_id: int) -> tuple:
+    """
+    Fingerprint of the per-application data behind the checklist, in one query: count and
+    newest id of the attachments and their checklist links, count and latest change of the statuses.
+    """
+    attachment_ids = select(Attachment.id).where(Attachment.application_id == application_id)
+    return tuple(
+        db.session.execute(
+            select(
+                select(func.count(Attachment.id))
+                .where(Attachment.application_id == application_id)
+                .scalar_subquery(),
+                select(func.max(Attachment.id))
+                .where(Attachment.application_id == application_id)
+                .scalar_subquery(),
+                select(func.count(AttachmentDocumentLink.id))
+                .where(AttachmentDocumentLink.attachment_id.in_(attachment_ids))
+                .scalar_subquery(),
+                select(func.max(AttachmentDocumentLink.id))
+                .where(AttachmentDocumentLink.attachment_id.in_(attachment_ids))
+                .scalar_subquery(),
+                select(func.count(ApplicationDocumentStatus.id))
+                .where(ApplicationDocumentStatus.application_id == application_id)
+                .scalar_subquery(),
+                select(func.max(ApplicationDocumentStatus.updated_at))
+                .where(ApplicationDocumentStatus.application_id == application_id)
+                .scalar_subquery(),
+            )
+        ).one()
+    )
+
+
+def _build_checklist_payload(application: Application | None) -> dict:
+    """
+    Document checklist for the candidate upload page (and the JSON refresh after uploads):
+    doc_items, missing_docs and uploaded_files.
+    """
+    doc_items = []
+    missing_docs = []
+    files_by_node = {}  # node_id -> list of attachment info
+    uploaded_files = []
+    if application is None:
+        return {"doc_items": doc_items, "missing_docs": missing_docs, "uploaded_files": uploaded_files}
+
+    # Checklist nodes with this application's status (outer join: no row = missing)
+    node_rows = (
+        db.session.query(JobDocumentNode, ApplicationDocumentStatus.status)
+        .outerjoin(
+            ApplicationDocumentStatus,
+            and_(
+                ApplicationDocumentStatus.node_id == JobDocumentNode.id,
+                ApplicationDocumentStatus.application_id == application.id,
+            ),
+        )
+        .filter(JobDocumentNode.job_id == application.job_id)
+        .order_by(JobDocumentNode.parent_id.asc().nullsfirst(), JobDocumentNode.sort_order.asc(), JobDocumentNode.id.asc())
+        .all()
+    )
+    all_nodes = [n for n, _status in node_rows]
+    by_id = {n.id: n for n in all_nodes}
+    status_by_node = {n.id: status for n, status in node_rows if status is not None}
+
+    # All attachments (newest first) with the checklist node(s) each one is linked to
+    attachment_rows = (
+        db.session.query(Attachment, AttachmentDocumentLink.node_id)
+        .outerjoin(AttachmentDocumentLink, AttachmentDocumentLink.attachment_id == Attachment.id)
+        .filter(Attachment.application_id == application.id)
+        .order_by(Attachment.id.desc())
+        .all()
+    )
+    seen_attachment_ids = set()
+    for att, node_id in reversed(attachment_rows):
+        if node_id is not None:
+            files_by_node.setdefault(node_id, []).append({
+                "id": att.id,
+                "name": att.file_name or "Datei",
+            })
+    for att, _node_id in attachment_rows:
+        if att.id in seen_attachment_ids:
+            continue
+        if len(uploaded_files) >= _UPLOADED_FILES_LIST_LIMIT:
+            break
+        seen_attachment_ids.add(att.id)
+        uploaded_files.append({
+            "id": att.id,
+            "name": att.file_name or "Datei",
+            "type": att.document_type,
+            "uploaded_by": att.uploaded_by,
+        })
+
+    # Full "Parent / Child / Item" label per node, built once: each node extends its parent's path.
+    # Parents always belong to the same job and are never re-assigned (see admin.add_job_doc_node),
+    # so the tree is acyclic; the placeholder entry still stops the walk on hand-edited data.
+    paths: dict[int, str | None] = {}
+    for n in all_nodes:
+        chain = []
+        cur = n
+        while cur is not None and cur.id not in paths:
+            paths[cur.id] = None
+            chain.append(cur)
+            cur = by_id.get(cur.parent_id) if cur.parent_id else None
+        prefix = paths.get(cur.id) if cur is not None else None
+        for node in reversed(chain):
+            title = f"{(node.code + ' ') if node.code else ''}{node.title}".strip()
+            prefix = f"{prefix} / {title}" if prefix is not None else title
+            paths[node.id] = prefix
+
+    for n in all_nodes:
+        if n.kind == "item":
+            db_status = status_by_node.get(n.id, "missing")
+            node_files = files_by_node.get(n.id, [])
+            # If files are linked but status is still missing, show as pending
+            if db_status == "missing" and node_files:
+                display_status = "pending"
+            else:
+                display_status = db_status
+
+            full_label = paths[n.id]
+            group = full_label.split(" / ")[0] if " / " in full_label else "Dokumente"
+            short_label = f"{(n.code + ' ') if n.code else ''}{n.title}".strip()
+            item = {
+                "id": n.id,
+                "label": full_label,
+                "title": n.title,
+                "code": n.code,
+                "required": n.required,
+                "status": display_status,
+                "group": group,
+                "short_label": short_label,
+                "files": node_files,
+            }
+            doc_items.append(item)
+            if display_status in {"missing", "wrong"} and n.required:
+                missing_docs.append(item)
+
+    # Sort for nicer UX (grouped dropdown)
+    doc_items.sort(key=lambda x: (str(x.get("group") or ""), str(x.get("label") or "")))
+
+    return {"doc_items": doc_items, "missing_docs": missing_docs, "uploaded_files": uploaded_files}
+
+
 @magic_links.post("/api/magic-links")
 @api_login_required
 def create_magic_link():
@@ -88,7 +342,7 @@ def create_magic_link():
     if not email:
         return jsonify({"error": "email_required"}), 400
 
-    scope = current_app.config["MAGIC_LINK_SCOPE_UPLOAD"]
+    scope = _settings().scope
     token = issue_magic_link(application_id, scope)
     link = public_url_for("magic_links.upload_page", token=token)
 
@@ -112,9 +366,8 @@ def create_magic_link():
 @limiter.limit("3/minute")
 def resend_magic_link(token: str):
     """Resend a fresh magic link based on an (even expired) token. Sends to candidate email on file."""
-    scope = current_app.config["MAGIC_LINK_SCOPE_UPLOAD"]
-    token_hash = hash_token(token)
-    record = MagicLinkToken.query.filter_by(token_hash=token_hash, scope=scope).first()
+    scope = _settings().scope
+    record = find_magic_link_token(token, scope)
     if record is None or record.revoked_at is not None:
         return jsonify({"error": "invalid"}), 404
 
@@ -135,8 +388,7 @@ def resend_magic_link(token: str):
 @magic_links.get("/r/<token>")
 @limiter.limit("10/minute")
 def upload_page(token: str):
-    scope = current_app.config["MAGIC_LINK_SCOPE_UPLOAD"]
-    record, error = _resolve_token(token, scope)
+    record, error = _resolve_token(token, _settings().scope)
 
     # For expired/invalid tokens, allow resend flow
     if error == "expired":
@@ -162,95 +414,31 @@ def upload_page(token: str):
             can_resend=False,
         ), 404
 
-    application = db.session.get(Application, record.application_id)
-    candidate = db.session.get(Candidate, application.candidate_id) if application else None
-    job = db.session.get(JobPosting, application.job_id) if application else None
-
-    # Build document checklist with status and linked files
-    doc_items = []
-    missing_docs = []
-    files_by_node = {}  # node_id -> list of attachment info
-
-    if application:
-        all_nodes = (
-            JobDocumentNode.query.filter_by(job_id=application.job_id)
-            .order_by(JobDocumentNode.parent_id.asc().nullsfirst(), JobDocumentNode.sort_order.asc(), JobDocumentNode.id.asc())
-            .all()
-        )
-        by_id = {n.id: n for n in all_nodes}
-
-        # Get document statuses
-        statuses = ApplicationDocumentStatus.query.filter_by(application_id=application.id).all()
-        status_by_node = {s.node_id: s.status for s in statuses}
-
-        # Get linked attachments per node
-        links = (
-            db.session.query(AttachmentDocumentLink, Attachment)
-            .join(Attachment, Attachment.id == AttachmentDocumentLink.attachment_id)
-            .filter(Attachment.application_id == application.id)
-            .all()
-        )
-        for link, att in links:
-            if link.node_id not in files_by_node:
-                files_by_node[link.node_id] = []
-            files_by_node[link.node_id].append({
-                "id": att.id,
-                "name": att.file_name or "Datei",
-            })
-
-        def label_for(node: JobDocumentNode) -> str:
-            parts = []
-            cur = node
-            guard = 0
-            while cur and guard < 20:
-                title = f"{(cur.code + ' ') if cur.code else ''}{cur.title}".strip()
-                parts.append(title)
-                cur = by_id.get(cur.parent_id) if cur.parent_id else None
-                guard += 1
-            return " / ".join(reversed(parts))
-
-        for n in all_nodes:
-            if n.kind == "item":
-                db_status = status_by_node.get(n.id, "missing")
-                node_files = files_by_node.get(n.id, [])
-                # If files are linked but status is still missing, show as pending
-                if db_status == "missing" and node_files:
-                    display_status = "pending"
-                else:
-                    display_status = db_status
-
-                full_label = label_for(n)
-                group = full_label.split(" / ")[0] if " / " in full_label else "Dokumente"
-                short_label = f"{(n.code + ' ') if n.code else ''}{n.title}".strip()
-                item = {
-                    "id": n.id,
-                    "label": full_label,
-                    "title": n.title,
-                    "code": n.code,
-                    "required": n.required,
-                    "status": display_status,
-                    "group": group,
-                    "short_label": short_label,
-                    "files": node_files,
-                }
-                doc_items.append(item)
-                if display_status in {"missing", "wrong"} and n.required:
-                    missing_docs.append(item)
-
-        # Sort for nicer UX (grouped dropdown)
-        doc_items.sort(key=lambda x: (str(x.get("group") or ""), str(x.get("label") or "")))
-
-    # Get already uploaded files for this application
-    uploaded_files = []
-    if application:
-        attachments = Attachment.query.filter_by(application_id=application.id).order_by(Attachment.id.desc()).all()
-        for att in attachments:
-            uploaded_files.append({
-                "id": att.id,
-                "name": att.file_name or "Datei",
-                "type": att.document_type,
-                "uploaded_by": att.uploaded_by,
-            })
+    # Candidates reload this page a lot. The key carries the application's checklist revision
+    # (read from the DB, so every worker sees the same one): any upload, delete, link or status
+    # change moves it, whoever made it. Checklist structure edits show up once the entry expires.
+    cache_key = (record.application_id, _checklist_revision(record.application_id))
+    cached = _upload_page_cache.get(cache_key)
+    if cached is not None and cached[0] > time.monotonic():
+        page_data = cached[1]
+    else:
+        # Application with candidate + job in one query
+        application = db.session.execute(
+            select(Application)
+            .options(joinedload(Application.candidate), joinedload(Application.job))
+            .where(Application.id == record.application_id)
+        ).scalar_one_or_none()
+        candidate = application.candidate if application else None
+        job = application.job if application else None
+        page_data = {
+            "candidate_name": candidate.name if candidate else None,
+            "job_title": job.title if job else None,
+            "reference_number": application.reference_number if application else None,
+            **_build_checklist_payload(application),
+        }
+        if len(_upload_page_cache) >= _UPLOAD_PAGE_CACHE_MAX_ENTRIES:
+            _upload_page_cache.clear()
+        _upload_page_cache[cache_key] = (time.monotonic() + _UPLOAD_PAGE_CACHE_SECONDS, page_data)
 
     # Token expiry info
     expires_at = ensure_utc_aware(record.expires_at)
@@ -261,12 +449,7 @@ def upload_page(token: str):
         "magic_link_upload.html",
         token=token,
         error=None,
-        candidate_name=candidate.name if candidate else None,
-        job_title=job.title if job else None,
-        reference_number=application.reference_number if application else None,
-        doc_items=doc_items,
-        missing_docs=missing_docs,
-        uploaded_files=uploaded_files,
+        **page_data,
         hours_remaining=hours_remaining,
         can_resend=True,
     ))
@@ -279,19 +462,16 @@ def upload_page(token: str):
 @magic_links.post("/r/<token>/upload")
 @csrf.exempt
 @limiter.limit("60/minute")
+@limiter.limit("30/minute", key_func=_token_rate_limit_key)
 def upload_files(token: str):
+    settings = _settings()
     # Per-route request size limit (Unterlagen uploads can be larger than the initial apply)
     try:
-        request.max_content_length = int(
-            current_app.config.get("UPLOAD_MAX_BYTES_MAGIC_LINK")
-            or current_app.config.get("MAX_CONTENT_LENGTH")
-            or 0
-        ) or None
+        request.max_content_length = settings.max_request_bytes
     except Exception:
         pass
 
-    scope = current_app.config["MAGIC_LINK_SCOPE_UPLOAD"]
-    record, error = _resolve_token(token, scope)
+    record, error = _resolve_token(token, settings.scope)
     if error:
         # Security: don't reveal specific error type to potential attackers
         return jsonify({"error": "invalid_or_expired"}), 404
@@ -299,23 +479,32 @@ def upload_files(token: str):
     # Additional security headers for the response
     # (handled at app level, but explicit here for clarity)
 
+    # A body larger than the whole per-application quota can never fit: reject before parsing it
+    if (
+        settings.max_total_bytes_per_app
+        and request.content_length
+        and request.content_length > settings.max_total_bytes_per_app
+    ):
+        return jsonify({"error": "quota_exceeded", "maxBytes": settings.max_total_bytes_per_app}), 400
+
     files = request.files.getlist("files")
     if not files:
         return jsonify({"error": "no_files"}), 400
 
-    # Upload limits (smart quotas)
-    max_files_per_request = int(current_app.config.get("UPLOAD_MAX_FILES_PER_REQUEST") or 10)
-    max_files_per_app = int(current_app.config.get("UPLOAD_MAX_FILES_PER_APPLICATION") or 50)
-    max_total_bytes_per_app = int(current_app.config.get("UPLOAD_MAX_TOTAL_BYTES_PER_APPLICATION") or 0)
-    max_pdf = int(current_app.config.get("UPLOAD_MAX_FILE_BYTES_PDF") or 0)
-    max_img = int(current_app.config.get("UPLOAD_MAX_FILE_BYTES_IMAGE") or 0)
-
     incoming_files = [f for f in (files or []) if f and f.filename]
-    if len(incoming_files) > max_files_per_request:
-        return jsonify({"error": "too_many_files", "max": max_files_per_request}), 400
+    if len(incoming_files) > settings.max_files_per_request:
+        return jsonify({"error": "too_many_files", "max": settings.max_files_per_request}), 400
+
+    # Type and per-file size checks first: they need no DB work. Sizes are measured once and
+    # reused by the quota check below. Validating every file before uploading any also means
+    # a bad file doesn't leave earlier ones orphaned in storage.
+    incoming_sizes = [filestorage_size_bytes(f) for f in incoming_files]
+    invalid = _file_validation_error(incoming_files, incoming_sizes, settings)
+    if invalid:
+        return invalid
 
     document_type = (request.form.get("document_type") or "other").strip()
-    if document_type not in {"cv", "cover_letter", "certificate", "other"}:
+    if document_type not in _DOC_TYPES:
         document_type = "other"
 
     doc_node_id_raw = (request.form.get("doc_node_id") or "").strip()
@@ -349,82 +538,57 @@ def upload_files(token: str):
         except Exception:
             existing_linked_candidate_attachments = []
 
-    allowed_types = current_app.config["ALLOWED_MIME_TYPES"]
     saved = []
     created_attachments = []
 
-    def _max_for_mime(mime: str) -> int | None:
-        if not mime:
-            return None
-        if mime == "application/pdf":
-            return max_pdf or None
-        if mime.startswith("image/"):
-            return max_img or None
-        return None
-
     # Per-application quota check (count + total bytes)
     try:
-        existing_count = Attachment.query.filter_by(application_id=record.application_id).count()
-        if existing_count + len(incoming_files) > max_files_per_app:
-            return jsonify({"error": "too_many_files_for_application", "max": max_files_per_app}), 400
-        if max_total_bytes_per_app:
-            import os
-
-            existing = Attachment.query.filter_by(application_id=record.application_id).all()
-            existing_bytes = 0
-            for a in existing:
-                try:
-                    if a.file_url and os.path.exists(a.file_url):
-                        existing_bytes += int(os.path.getsize(a.file_url))
-                except Exception:
-                    continue
-            incoming_bytes = 0
-            for f in incoming_files:
-                sz = filestorage_size_bytes(f)
-                if sz:
-                    incoming_bytes += int(sz)
-            if existing_bytes + incoming_bytes > max_total_bytes_per_app:
-                return jsonify({"error": "quota_exceeded", "maxBytes": max_total_bytes_per_app}), 400
+        # Count and stored size in one aggregate (rows from before size_bytes count as 0 bytes)
+        existing_count, existing_bytes = db.session.execute(
+            select(func.count(Attachment.id), func.coalesce(func.sum(Attachment.size_bytes), 0)).where(
+                Attachment.application_id == record.application_id
+            )
+        ).one()
+        if existing_count + len(incoming_files) > settings.max_files_per_app:
+            return jsonify({"error": "too_many_files_for_application", "max": settings.max_files_per_app}), 400
+        if settings.max_total_bytes_per_app:
+            incoming_bytes = sum(int(sz) for sz in incoming_sizes if sz)
+            if int(existing_bytes) + incoming_bytes > settings.max_total_bytes_per_app:
+                return jsonify({"error": "quota_exceeded", "maxBytes": settings.max_total_bytes_per_app}), 400
     except Exception:
         # If quota calculation fails, continue (best-effort)
         pass
 
-    for file in files:
-        if not file or not file.filename:
-            continue
-        if file.mimetype not in allowed_types:
-            return jsonify({"error": "invalid_file_type"}), 400
-        size = filestorage_size_bytes(file)
-        limit = _max_for_mime(file.mimetype)
-        if size is not None and limit and size > limit:
-            return jsonify({"error": "file_too_large", "maxBytes": limit}), 400
+    try:
+        saved_files = save_files(incoming_files, record.application_id)
+    except SupabaseAPIError:
         try:
-            saved_file = save_file(file, record.application_id)
-        except SupabaseAPIError:
-            try:
-                db.session.rollback()
-            except Exception:
-                pass
-            try:
-                current_app.logger.warning("Magic-link upload failed due to Supabase storage error", exc_info=True)
-            except Exception:
-                pass
-            return jsonify({"error": "storage_not_configured"}), 503
+            db.session.rollback()
         except Exception:
-            try:
-                db.session.rollback()
-            except Exception:
-                pass
-            try:
-                current_app.logger.exception("Magic-link upload failed")
-            except Exception:
-                pass
-            return jsonify({"error": "upload_failed"}), 500
+            pass
+        try:
+            current_app.logger.warning("Magic-link upload failed due to Supabase storage error", exc_info=True)
+        except Exception:
+            pass
+        return jsonify({"error": "storage_not_configured"}), 503
+    except Exception:
+        try:
+            db.session.rollback()
+        except Exception:
+            pass
+        try:
+            current_app.logger.exception("Magic-link upload failed")
+        except Exception:
+            pass
+        return jsonify({"error": "upload_failed"}), 500
+
+    for saved_file in saved_files:
         attachment = Attachment(
             application_id=record.application_id,
             file_url=saved_file["file_url"],
             file_name=saved_file["file_name"],
             file_type=saved_file["file_type"],
+            size_bytes=saved_file.get("size_bytes"),
             document_type=document_type,
             uploaded_by="candidate",
         )
@@ -432,20 +596,19 @@ def upload_files(token: str):
         saved.append(saved_file)
         created_attachments.append(attachment)
 
+    # Read the new ids before commit (committing expires the rows, which would reload each one)
+    db.session.flush()
+    created_attachment_ids = [a.id for a in created_attachments]
     db.session.commit()
 
     # Optional: link uploaded attachments to a checklist item (candidate hint, recruiter can adjust)
-    if node:
-        for a in created_attachments:
-            existing = AttachmentDocumentLink.query.filter_by(attachment_id=a.id, node_id=node.id).first()
-            if not existing:
-                db.session.add(
-                    AttachmentDocumentLink(
-                        attachment_id=a.id,
-                        node_id=node.id,
-                        linked_by_user_id=None,
-                    )
-                )
+    if node and created_attachment_ids:
+        insert_document_links(
+            [
+                {"attachment_id": attachment_id, "node_id": node.id, "linked_by_user_id": None}
+                for attachment_id in created_attachment_ids
+            ]
+        )
         db.session.commit()
 
     # Replace semantics: remove previously linked candidate uploads for this checklist item.
@@ -465,7 +628,11 @@ def upload_files(token: str):
 
                 # Only delete the attachment record if it isn't linked anywhere else
                 try:
-                    remaining_links = AttachmentDocumentLink.query.filter_by(attachment_id=old_att.id).count()
+                    remaining_links = db.session.scalar(
+                        select(func.count(AttachmentDocumentLink.id)).where(
+                            AttachmentDocumentLink.attachment_id == old_att.id
+                        )
+                    )
                 except Exception:
                     remaining_links = 0
 
@@ -499,166 +666,91 @@ def upload_files(token: str):
         msg = f"Neue Unterlagen eingegangen für Bewerbung #{application.reference_number or application.id}"
         if node:
             msg = msg + f" ({node.title})"
-        recipients = [u.id for u in User.query.filter_by(role="recruiter").all()]
-        # Also notify admins
-        recipients += [u.id for u in User.query.filter_by(role="admin").all()]
-        for uid in set(recipients):
-            db.session.add(
-                Notification(
-                    user_id=uid,
-                    application_id=application.id,
-                    type="candidate_upload",
-                    message=msg,
-                )
+        # Recruiters + admins (id and email in one query; emails reused below)
+        recipients = db.session.execute(
+            select(User.id, User.email).where(User.role.in_(("recruiter", "admin"))).order_by(User.id)
+        ).all()
+        if recipients:
+            db.session.execute(
+                insert(Notification),
+                [
+                    {"user_id": uid, "application_id": application.id, "type": "candidate_upload", "message": msg}
+                    for uid, _email in recipients
+                ],
             )
-        db.session.commit()
 
         # Email (best-effort): alert recipients that new docs arrived
-        # Throttle: only send email once per configured interval (default 30 min) per application
-        should_send_email = False
-        throttle_minutes = int(current_app.config.get("CANDIDATE_UPLOAD_EMAIL_THROTTLE_MINUTES") or 30)
+        # Throttle: only send email once per configured interval (default 30 min) per application.
+        # Claimed with one conditional UPDATE, so of two concurrent uploads only one sends.
+        throttle_minutes = settings.email_throttle_minutes
         if throttle_minutes > 0:
             now = utcnow()
-            last_email = ensure_utc_aware(application.last_candidate_upload_email_at) if application.last_candidate_upload_email_at else None
-            if not last_email or (now - last_email).total_seconds() >= (throttle_minutes * 60):
-                should_send_email = True
-                application.last_candidate_upload_email_at = now
-                db.session.add(application)
-                db.session.commit()
+            claimed = db.session.execute(
+                update(Application)
+                .where(
+                    Application.id == application.id,
+                    or_(
+                        Application.last_candidate_upload_email_at.is_(None),
+                        Application.last_candidate_upload_email_at <= now - timedelta(minutes=throttle_minutes),
+                    ),
+                )
+                .values(last_candidate_upload_email_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            should_send_email = claimed == 1
         else:
             # Throttle disabled (0 or negative) → always send
             should_send_email = True
 
-        if should_send_email:
-            try:
-                application_url = public_url_for("internal.application_detail", application_id=application.id)
-                uploaded_names = [s.get("file_name") for s in (saved or []) if isinstance(s, dict) and s.get("file_name")]
-                for uid in set(recipients):
-                    u = db.session.get(User, uid)
-                    if not u or not u.email:
-                        continue
-                    send_candidate_upload_notification(
-                        to_email=u.email,
-                        reference_number=str(application.reference_number or application.id),
-                        application_url=application_url,
-                        doc_title=(node.title if node else None),
-                        uploaded_file_names=[str(x) for x in uploaded_names],
-                    )
-            except Exception:
-                try:
-                    current_app.logger.warning("Candidate-upload email notify failed", exc_info=True)
-                except Exception:
-                    pass
-
+    # Token usage is stamped in the route's final commit, once every change of this upload is in
     mark_token_used(record)
-
-    # Build updated document status for frontend refresh
-    updated_doc_items = []
-    updated_missing_docs = []
-    updated_uploaded_files = []
-    updated_files_by_node = {}
+    db.session.commit()
 
     if application:
-        all_nodes = (
-            JobDocumentNode.query.filter_by(job_id=application.job_id)
-            .order_by(JobDocumentNode.parent_id.asc().nullsfirst(), JobDocumentNode.sort_order.asc(), JobDocumentNode.id.asc())
-            .all()
-        )
-        by_id = {n.id: n for n in all_nodes}
-
-        # Refresh document statuses from DB
-        statuses = ApplicationDocumentStatus.query.filter_by(application_id=application.id).all()
-        status_by_node = {s.node_id: s.status for s in statuses}
-
-        # Get linked attachments per node (with file info)
-        links = (
-            db.session.query(AttachmentDocumentLink, Attachment)
-            .join(Attachment, Attachment.id == AttachmentDocumentLink.attachment_id)
-            .filter(Attachment.application_id == application.id)
-            .all()
-        )
-        for link, att in links:
-            if link.node_id not in updated_files_by_node:
-                updated_files_by_node[link.node_id] = []
-            updated_files_by_node[link.node_id].append({
-                "id": att.id,
-                "name": att.file_name or "Datei",
-            })
-
-        def label_for(n):
-            parts = []
-            cur = n
-            guard = 0
-            while cur and guard < 20:
-                title = f"{(cur.code + ' ') if cur.code else ''}{cur.title}".strip()
-                parts.append(title)
-                cur = by_id.get(cur.parent_id) if cur.parent_id else None
-                guard += 1
-            return " / ".join(reversed(parts))
-
-        for n in all_nodes:
-            if n.kind == "item":
-                db_status = status_by_node.get(n.id, "missing")
-                node_files = updated_files_by_node.get(n.id, [])
-                # If candidate linked a file but recruiter hasn't marked received yet, show as "pending"
-                if db_status == "missing" and node_files:
-                    display_status = "pending"
-                else:
-                    display_status = db_status
-
-                full_label = label_for(n)
-                group = full_label.split(" / ")[0] if " / " in full_label else "Dokumente"
-                short_label = f"{(n.code + ' ') if n.code else ''}{n.title}".strip()
-
-                item = {
-                    "id": n.id,
-                    "label": full_label,
-                    "title": n.title,
-                    "code": n.code,
-                    "required": n.required,
-                    "status": display_status,
-                    "group": group,
-                    "short_label": short_label,
-                    "files": node_files,
-                }
-                updated_doc_items.append(item)
-                if display_status in {"missing", "wrong"} and n.required:
-                    updated_missing_docs.append(item)
-
-        updated_doc_items.sort(key=lambda x: (str(x.get("group") or ""), str(x.get("label") or "")))
-
-        # Refresh uploaded files list
-        attachments = Attachment.query.filter_by(application_id=application.id).order_by(Attachment.id.desc()).all()
-        for att in attachments:
-            updated_uploaded_files.append({
-                "id": att.id,
-                "name": att.file_name or "Datei",
-                "type": att.document_type,
-                "uploaded_by": att.uploaded_by,
-            })
+        to_emails = [email for _uid, email in recipients if email]
+        if should_send_email and to_emails:
+            # Sent after the commits above, off the request path (see send_in_background)
+            uploaded_names = [s.get("file_name") for s in (saved or []) if isinstance(s, dict) and s.get("file_name")]
+            send_in_background(
+                send_candidate_upload_notifications,
+                to_emails=to_emails,
+                reference_number=str(application.reference_number or application.id),
+                application_url=public_url_for("internal.application_detail", application_id=application.id),
+                doc_title=(node.title if node else None),
+                uploaded_file_names=[str(x) for x in uploaded_names],
+            )
 
-    return jsonify({
+    # Updated state for the frontend refresh. all_uploaded_files is always included;
+    # doc_items/missing_docs only when the files were linked to a checklist item
+    # (unlinked uploads don't change the checklist, so it isn't rebuilt for them).
+    payload = {
         "status": "uploaded",
         "count": len(saved),
         "uploaded_files": [{"name": s["file_name"]} for s in saved],
         "linked_node_id": node.id if node else None,
-        "doc_items": updated_doc_items,
-        "missing_docs": updated_missing_docs,
-        "all_uploaded_files": updated_uploaded_files,
-    }), 201
+    }
+    if node:
+        checklist = _build_checklist_payload(application)
+        payload["doc_items"] = checklist["doc_items"]
+        payload["missing_docs"] = checklist["missing_docs"]
+        payload["all_uploaded_files"] = checklist["uploaded_files"]
+    else:
+        payload["all_uploaded_files"] = _uploaded_files_payload(record.application_id)
+
+    return jsonify(payload), 201
 
 
 @magic_links.delete("/r/<token>/attachments/<int:attachment_id>")
 @csrf.exempt
 @limiter.limit("30/minute")
+@limiter.limit("30/minute", key_func=_token_rate_limit_key)
 def delete_attachment_via_magic_link(token: str, attachment_id: int):
     """
     Delete an uploaded attachment via magic link.
     
     Candidates can only delete their own uploads (uploaded_by='candidate').
     """
-    scope = current_app.config["MAGIC_LINK_SCOPE_UPLOAD"]
-    record, error = _resolve_token(token, scope)
+    record, error = _resolve_token(token, _settings().scope)
     if error:
         return jsonify({"error": "invalid_or_expired"}), 404
 
@@ -678,8 +770,9 @@ def delete_attachment_via_magic_link(token: str, attachment_id: int):
     except Exception:
         pass
 
-    # Delete from database
+    # Delete from database (token usage is stamped in the same commit)
     db.session.delete(attachment)
+    mark_token_used(record)
     db.session.commit()
 
     # Delete from storage (best-effort)
@@ -692,20 +785,7 @@ def delete_attachment_via_magic_link(token: str, attachment_id: int):
             except Exception:
                 pass
 
-    mark_token_used(record)
-
-    # Return updated uploaded files list
-    updated_uploaded_files = []
-    attachments = Attachment.query.filter_by(application_id=record.application_id).order_by(Attachment.id.desc()).all()
-    for att in attachments:
-        updated_uploaded_files.append({
-            "id": att.id,
-            "name": att.file_name or "Datei",
-            "type": att.document_type,
-            "uploaded_by": att.uploaded_by,
-        })
-
     return jsonify({
         "status": "deleted",
-        "all_uploaded_files": updated_uploaded_files,
+        "all_uploaded_files": _uploaded_files_payload(record.application_id),
     }), 200
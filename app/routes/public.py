@@ -1,7 +1,11 @@
 from datetime import datetime, timezone, date
 import secrets
+import time
 
 from flask import Blueprint, current_app, render_template, request
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
 from ..extensions import db
 from ..models import (
@@ -9,16 +13,39 @@ from ..models import (
     ApplicationStepInstance,
     Attachment,
     Candidate,
-    DocumentRequirement,
     JobPosting,
     WorkflowStep,
 )
 from ..supabase import SupabaseAPIError
-from ..storage import save_file
-from ..email import send_application_confirmation
+from ..storage import delete_file, save_files
+from ..email import send_application_confirmation, send_in_background
 
 public = Blueprint("public", __name__)
 
+# Process-level cache of the public job listing: (filters, date) -> (expires_at, page data).
+# Admin job edits clear it; the TTL bounds staleness across worker processes.
+_JOB_LIST_CACHE_SECONDS = 60
+_JOB_LIST_CACHE_MAX_ENTRIES = 256
+_job_list_cache: dict[tuple, tuple[float, dict]] = {}
+
+
+def invalidate_job_list_cache() -> None:
+    _job_list_cache.clear()
+
+
+def _new_reference_number(today: date) -> str:
+    return f"APP-{today.strftime('%Y%m%d')}-{secrets.token_hex(4).upper()}"
+
+
+def _job_with_requirements(job_id: int) -> JobPosting | None:
+    # Job and its document requirements in one round-trip (job detail + apply)
+    return db.session.execute(
+        select(JobPosting)
+        .options(joinedload(JobPosting.document_requirements))
+        .where(JobPosting.id == job_id)
+    ).unique().scalar_one_or_none()
+
+
 @public.get("/datenschutz")
 def privacy_notice():
     return render_template("privacy_notice.html")
@@ -36,7 +63,37 @@ def job_list():
     employment_type = (request.args.get("type") or "").strip()
 
     today = date.today()
-    query = JobPosting.query.filter(
+    # The date is part of the key so postings drop off at midnight without an invalidation
+    cache_key = (q, location, employment_type, today)
+    cached = _job_list_cache.get(cache_key)
+    if cached is not None and cached[0] > time.monotonic():
+        page_data = cached[1]
+    else:
+        page_data = _load_job_list(q, location, employment_type, today)
+        if len(_job_list_cache) >= _JOB_LIST_CACHE_MAX_ENTRIES:
+            _job_list_cache.clear()
+        _job_list_cache[cache_key] = (time.monotonic() + _JOB_LIST_CACHE_SECONDS, page_data)
+
+    return render_template(
+        "jobs_list.html",
+        q=q,
+        location=location,
+        employment_type=employment_type,
+        results_count=len(page_data["jobs"]),
+        **page_data,
+    )
+
+
+def _load_job_list(q: str, location: str, employment_type: str, today: date) -> dict:
+    # Only the columns the listing renders; rows are plain tuples, safe to keep across requests
+    query = db.session.query(
+        JobPosting.id,
+        JobPosting.title,
+        JobPosting.location,
+        JobPosting.department,
+        JobPosting.employment_type,
+        JobPosting.description,
+    ).filter(
         JobPosting.published.is_(True),
         JobPosting.published_until.isnot(None),
         JobPosting.published_until >= today,
@@ -50,54 +107,37 @@ def job_list():
 
     jobs = query.order_by(JobPosting.created_at.desc()).all()
 
-    locations = (
-        db.session.query(JobPosting.location)
-        .filter(
-            JobPosting.published.is_(True),
-            JobPosting.published_until.isnot(None),
-            JobPosting.published_until >= today,
-            JobPosting.location.isnot(None),
-        )
-        .distinct()
-        .order_by(JobPosting.location.asc())
-        .all()
-    )
-    types = (
-        db.session.query(JobPosting.employment_type)
-        .filter(
-            JobPosting.published.is_(True),
-            JobPosting.published_until.isnot(None),
-            JobPosting.published_until >= today,
-            JobPosting.employment_type.isnot(None),
+    # Filter dropdowns list every published location/type, not just the filtered results.
+    # Unfiltered, that is exactly `jobs`; otherwise one DISTINCT query fetches both columns.
+    if q or location or employment_type:
+        facet_rows = (
+            db.session.query(JobPosting.location, JobPosting.employment_type)
+            .filter(
+                JobPosting.published.is_(True),
+                JobPosting.published_until.isnot(None),
+                JobPosting.published_until >= today,
+            )
+            .distinct()
+            .all()
         )
-        .distinct()
-        .order_by(JobPosting.employment_type.asc())
-        .all()
-    )
-    location_options = [row[0] for row in locations if row[0]]
-    type_options = [row[0] for row in types if row[0]]
+    else:
+        facet_rows = [(j.location, j.employment_type) for j in jobs]
 
-    return render_template(
-        "jobs_list.html",
-        jobs=jobs,
-        q=q,
-        location=location,
-        employment_type=employment_type,
-        location_options=location_options,
-        type_options=type_options,
-        results_count=len(jobs),
-    )
+    return {
+        "jobs": jobs,
+        "location_options": sorted({loc for loc, _type in facet_rows if loc}),
+        "type_options": sorted({etype for _loc, etype in facet_rows if etype}),
+    }
 
 
 @public.get("/jobs/<int:job_id>")
 def job_detail(job_id: int):
-    job = db.session.get(JobPosting, job_id)
+    job = _job_with_requirements(job_id)
     today = date.today()
     if not job or not job.published or (not job.published_until) or (job.published_until < today):
         return render_template("job_detail.html", job=None), 404
 
-    reqs = DocumentRequirement.query.filter_by(job_id=job.id).all()
-    req_by_type = {r.document_type: r.required for r in reqs}
+    req_by_type = {r.document_type: r.required for r in job.document_requirements}
     cv_required = req_by_type.get("cv", True)
     cover_letter_required = req_by_type.get("cover_letter", False)
     certificate_required = req_by_type.get("certificate", False)
@@ -122,13 +162,12 @@ def job_full_detail(job_id: int):
 
 @public.post("/jobs/<int:job_id>/apply")
 def apply(job_id: int):
-    job = db.session.get(JobPosting, job_id)
+    job = _job_with_requirements(job_id)
     today = date.today()
     if not job or not job.published or (not job.published_until) or (job.published_until < today):
         return render_template("job_detail.html", job=None), 404
 
-    reqs = DocumentRequirement.query.filter_by(job_id=job.id).all()
-    req_by_type = {r.document_type: r.required for r in reqs}
+    req_by_type = {r.document_type: r.required for r in job.document_requirements}
     cv_required = req_by_type.get("cv", True)
     cover_letter_required = req_by_type.get("cover_letter", False)
     certificate_required = req_by_type.get("certificate", False)
@@ -165,48 +204,7 @@ def apply(job_id: int):
         except ValueError:
             pass
 
-    candidate = Candidate(
-        name=name,
-        email=email,
-        phone=phone or None,
-        address=address or None,
-        earliest_start_date=earliest_start_date,
-        consent_at=datetime.now(timezone.utc),
-        consent_version="v1",
-    )
-    db.session.add(candidate)
-    db.session.flush()
-
-    # Generate unique reference number
-    ref_number = f"APP-{datetime.now().strftime('%Y%m%d')}-{secrets.token_hex(4).upper()}"
-    while Application.query.filter_by(reference_number=ref_number).first():
-        ref_number = f"APP-{datetime.now().strftime('%Y%m%d')}-{secrets.token_hex(4).upper()}"
-
-    application = Application(
-        candidate_id=candidate.id,
-        job_id=job.id,
-        status="new",
-        reference_number=ref_number,
-        source="public",
-    )
-    db.session.add(application)
-    db.session.flush()
-
-    steps = WorkflowStep.query.filter_by(workflow_id=job.workflow_id).order_by(WorkflowStep.step_order).all()
-    step_instances = []
-    for step in steps:
-        instance = ApplicationStepInstance(
-            application_id=application.id,
-            step_id=step.id,
-            state="open",
-            data_json=None,
-        )
-        db.session.add(instance)
-        step_instances.append(instance)
-
-    if step_instances:
-        application.current_step_id = step_instances[0].id
-
+    # Everything that can reject the submission is checked before the first DB write
     allowed_types = current_app.config["ALLOWED_MIME_TYPES"]
 
     cv_file = request.files.get("cv")
@@ -223,30 +221,99 @@ def apply(job_id: int):
     if certificate_required and not any(f and f.filename for f in (cert_files or [])):
         return _render_apply_error("Bitte laden Sie mindestens ein Zeugnis hoch.")
 
-    def _save_one(file_storage, doc_type: str):
-        if not file_storage or not file_storage.filename:
-            return
-        if file_storage.mimetype not in allowed_types:
-            return
-        saved_file = save_file(file_storage, application.id)
-        db.session.add(
-            Attachment(
-                application_id=application.id,
-                file_url=saved_file["file_url"],
-                file_name=saved_file["file_name"],
-                file_type=saved_file["file_type"],
-                document_type=doc_type,
-                uploaded_by="candidate",
-            )
+    uploads = [(cv_file, "cv"), (cover_file, "cover_letter")]
+    uploads += [(f, "certificate") for f in cert_files]
+    uploads += [(f, "other") for f in other_files]
+    uploads = [
+        (f, doc_type)
+        for f, doc_type in uploads
+        if f and f.filename and f.mimetype in allowed_types
+    ]
+
+    # reference_number is unique in the DB; a 32-bit collision is rare enough to retry once on flush
+    # rather than SELECT-ing before every insert. Nothing is stored yet, so a rollback loses no uploads.
+    consent_at = datetime.now(timezone.utc)
+    for attempt in range(2):
+        candidate = Candidate(
+            name=name,
+            email=email,
+            phone=phone or None,
+            address=address or None,
+            earliest_start_date=earliest_start_date,
+            consent_at=consent_at,
+            consent_version="v1",
+        )
+        db.session.add(candidate)
+        db.session.flush()
+
+        application = Application(
+            candidate_id=candidate.id,
+            job_id=job.id,
+            status="new",
+            reference_number=_new_reference_number(today),
+            source="public",
+        )
+        db.session.add(application)
+        try:
+            db.session.flush()
+            break
+        except IntegrityError:
+            db.session.rollback()
+            if attempt:
+                current_app.logger.exception("Apply submission failed: reference number collision")
+                return _render_apply_error("Es ist ein Fehler aufgetreten. Bitte später erneut versuchen.")
+
+    steps = db.session.execute(
+        select(WorkflowStep.id, WorkflowStep.step_order)
+        .where(WorkflowStep.workflow_id == job.workflow_id)
+        .order_by(WorkflowStep.step_order)
+    ).all()
+    if steps:
+        db.session.execute(
+            insert(ApplicationStepInstance),
+            [
+                {
+                    "application_id": application.id,
+                    "step_id": step_id,
+                    "step_order": step_order,
+                    "state": "open",
+                    "data_json": None,
+                }
+                for step_id, step_order in steps
+            ],
+        )
+        # First step becomes the active one; ids are only known after the insert
+        application.current_step_id = db.session.scalar(
+            select(ApplicationStepInstance.id)
+            .where(ApplicationStepInstance.application_id == application.id)
+            .order_by(ApplicationStepInstance.step_order, ApplicationStepInstance.id)
+            .limit(1)
         )
 
+    # Values for the confirmation mail, read before the commit expires the instances
+    candidate_email = candidate.email
+    reference = application.reference_number or str(application.id)
+
+    saved_files = []
     try:
-        _save_one(cv_file, "cv")
-        _save_one(cover_file, "cover_letter")
-        for f in cert_files:
-            _save_one(f, "certificate")
-        for f in other_files:
-            _save_one(f, "other")
+        # Storage uploads run concurrently (see save_files)
+        saved_files = save_files([f for f, _doc_type in uploads], application.id)
+        if saved_files:
+            db.session.execute(
+                insert(Attachment),
+                [
+                    {
+                        "application_id": application.id,
+                        "file_url": saved_file["file_url"],
+                        "file_name": saved_file["file_name"],
+                        "file_type": saved_file["file_type"],
+                        "size_bytes": saved_file.get("size_bytes"),
+                        "document_type": doc_type,
+                        "uploaded_by": "candidate",
+                    }
+                    for saved_file, (_f, doc_type) in zip(saved_files, uploads)
+                ],
+            )
 
         db.session.commit()
     except SupabaseAPIError:
@@ -268,13 +335,16 @@ def apply(job_id: int):
             db.session.rollback()
         except Exception:
             pass
+        # The uploads succeeded but nothing references them any more
+        for saved_file in saved_files:
+            delete_file(saved_file["file_url"])
         try:
             current_app.logger.exception("Apply submission failed")
         except Exception:
             pass
         return _render_apply_error("Es ist ein Fehler aufgetreten. Bitte später erneut versuchen.")
 
-    # Email confirmation (optional via M365)
-    send_application_confirmation(candidate.email, application.reference_number or str(application.id))
+    # Email confirmation (optional via M365), off the request path
+    send_in_background(send_application_confirmation, candidate_email, reference)
 
     return render_template("apply_thanks.html", application=application)
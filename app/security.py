@@ -1,11 +1,13 @@
-import base64
 import hashlib
 import hmac
 import secrets
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from flask import current_app
+from flask import current_app, g
+from sqlalchemy import update
+from sqlalchemy.orm import load_only
 
 from .extensions import db
 from .models import MagicLinkToken, PasswordResetToken
@@ -31,29 +33,98 @@ def ensure_utc_aware(dt: datetime) -> datetime:
 
 
 def generate_token() -> str:
-    random_bytes = secrets.token_bytes(32)
-    return base64.urlsafe_b64encode(random_bytes).rstrip(b"=").decode("ascii")
+    # 32 random bytes, URL-safe base64 without padding (43 chars)
+    return secrets.token_urlsafe(32)
+
+
+_KEYS_EXTENSION_KEY = "security_token_keys"
+
+
+@dataclass(frozen=True)
+class _TokenKeys:
+    """Encoded token secrets, derived from app config once per app."""
+
+    magic_link: bytes
+    magic_link_hash: bytes
+    password_reset: bytes
+    password_reset_hash: bytes
+
+    @classmethod
+    def from_config(cls, config) -> "_TokenKeys":
+        magic_link = config["MAGIC_LINK_HMAC_SECRET"].encode("utf-8")
+        # Separate secret for password reset tokens (optional), falling back to the magic link one
+        password_reset = (config.get("PASSWORD_RESET_HMAC_SECRET") or config["MAGIC_LINK_HMAC_SECRET"]).strip().encode("utf-8")
+        return cls(
+            magic_link=magic_link,
+            # BLAKE2b keys are limited to 64 bytes, so derive a fixed-size key from the configured secret
+            magic_link_hash=hashlib.blake2b(magic_link, digest_size=32, person=b"magic-link").digest(),
+            password_reset=password_reset,
+            password_reset_hash=hashlib.blake2b(password_reset, digest_size=32, person=b"password-reset").digest(),
+        )
+
+
+def _token_keys() -> _TokenKeys:
+    app = current_app._get_current_object()  # resolve the proxy once
+    keys = app.extensions.get(_KEYS_EXTENSION_KEY)
+    if keys is None:
+        keys = app.extensions[_KEYS_EXTENSION_KEY] = _TokenKeys.from_config(app.config)
+    return keys
 
 
 def _hmac_secret() -> bytes:
-    secret = current_app.config["MAGIC_LINK_HMAC_SECRET"]
-    return secret.encode("utf-8")
+    return _token_keys().magic_link
 
 
 def _password_reset_hmac_secret() -> bytes:
-    """
-    Separate secret for password reset tokens (optional).
-    Falls back to MAGIC_LINK_HMAC_SECRET if not configured.
-    """
-    secret = (current_app.config.get("PASSWORD_RESET_HMAC_SECRET") or current_app.config["MAGIC_LINK_HMAC_SECRET"]).strip()
-    return secret.encode("utf-8")
+    return _token_keys().password_reset
+
+
+def _token_hash_key() -> bytes:
+    return _token_keys().magic_link_hash
 
 
 def hash_token(token: str) -> bytes:
+    """Lookup key for a magic link token: keyed BLAKE2b with a 160-bit digest."""
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=20, key=_token_hash_key()).digest()
+
+
+def _legacy_hash_token(token: str) -> bytes:
+    # HMAC-SHA256 key of links issued before the switch to BLAKE2b. Still accepted so those links
+    # keep working (and can be resent after expiry); drop once no such rows are needed anymore.
     return hmac.new(_hmac_secret(), token.encode("utf-8"), hashlib.sha256).digest()
 
 
+def find_magic_link_token(token: str, scope: str) -> Optional[MagicLinkToken]:
+    """Token row for a raw token (current or legacy hash), without expiry/revocation checks."""
+    # Probes idx_magic_link_tokens_hash_scope; created_at is never read on this path
+    return (
+        MagicLinkToken.query.filter(
+            MagicLinkToken.token_hash.in_((hash_token(token), _legacy_hash_token(token))),
+            MagicLinkToken.scope == scope,
+        )
+        .options(
+            load_only(
+                MagicLinkToken.application_id,
+                MagicLinkToken.token_hash,
+                MagicLinkToken.scope,
+                MagicLinkToken.expires_at,
+                MagicLinkToken.revoked_at,
+                MagicLinkToken.last_used_at,
+                MagicLinkToken.fail_count,
+            )
+        )
+        .first()
+    )
+
+
 def hash_password_reset_token(token: str) -> bytes:
+    """Lookup key for a password reset token: keyed BLAKE2b with a 256-bit digest."""
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=32, key=_token_keys().password_reset_hash).digest()
+
+
+def _legacy_hash_password_reset_token(token: str) -> bytes:
+    # HMAC-SHA256 key of reset links issued before the switch to BLAKE2b; only needed until
+    # those have expired (PASSWORD_RESET_TTL_HOURS after deploy).
     return hmac.new(_password_reset_hmac_secret(), token.encode("utf-8"), hashlib.sha256).digest()
 
 
@@ -79,8 +150,7 @@ def issue_magic_link(application_id: int, scope: str) -> str:
 
 
 def lookup_token(token: str, scope: str) -> Optional[MagicLinkToken]:
-    token_hash = hash_token(token)
-    record = MagicLinkToken.query.filter_by(token_hash=token_hash, scope=scope).first()
+    record = find_magic_link_token(token, scope)
     if record is None:
         return None
     if record.revoked_at is not None:
@@ -91,14 +161,19 @@ def lookup_token(token: str, scope: str) -> Optional[MagicLinkToken]:
 
 
 def mark_token_used(record: MagicLinkToken) -> None:
+    """Stamp last_used_at; written by the caller's next commit (no separate round trip)."""
     record.last_used_at = utcnow()
     db.session.add(record)
-    db.session.commit()
 
 
 def increment_fail(record: MagicLinkToken) -> None:
-    record.fail_count += 1
-    db.session.add(record)
+    # Incremented in SQL, so concurrent failed attempts cannot overwrite each other's count
+    db.session.execute(
+        update(MagicLinkToken)
+        .where(MagicLinkToken.id == record.id)
+        .values(fail_count=MagicLinkToken.fail_count + 1)
+        .execution_options(synchronize_session=False)
+    )
     db.session.commit()
 
 
@@ -112,8 +187,12 @@ def is_token_locked(record: MagicLinkToken, max_failures: int = 10) -> bool:
 
 def revoke_token(record: MagicLinkToken) -> None:
     """Revoke a magic link token (e.g., after too many failures)."""
-    record.revoked_at = utcnow()
-    db.session.add(record)
+    db.session.execute(
+        update(MagicLinkToken)
+        .where(MagicLinkToken.id == record.id, MagicLinkToken.revoked_at.is_(None))
+        .values(revoked_at=utcnow())
+        .execution_options(synchronize_session=False)
+    )
     db.session.commit()
 
 
@@ -132,18 +211,39 @@ def issue_password_reset_token(user_id: int) -> str:
 
 
 def lookup_password_reset_token(token: str) -> PasswordResetToken | None:
-    token_hash = hash_password_reset_token(token)
-    record = PasswordResetToken.query.filter_by(token_hash=token_hash).first()
-    if record is None:
-        return None
-    if record.used_at is not None:
-        return None
-    if ensure_utc_aware(record.expires_at) <= utcnow():
-        return None
+    """
+    Resolve a password reset token via its (unique-indexed) keyed hash.
+
+    The result is memoized on `flask.g` so repeated lookups of the same token
+    within one request only hit the database once.
+    """
+    cache = g.setdefault("_pwreset_lookup", {})
+    if token in cache:
+        return cache[token]
+
+    record = (
+        PasswordResetToken.query.filter(
+            PasswordResetToken.token_hash.in_((hash_password_reset_token(token), _legacy_hash_password_reset_token(token)))
+        )
+        .options(load_only(PasswordResetToken.user_id, PasswordResetToken.expires_at, PasswordResetToken.used_at))
+        .first()
+    )
+    if record is not None and (
+        record.used_at is not None or ensure_utc_aware(record.expires_at) <= utcnow()
+    ):
+        record = None
+    cache[token] = record
     return record
 
 
 def mark_password_reset_used(record: PasswordResetToken) -> None:
-    record.used_at = utcnow()
-    db.session.add(record)
+    """Consume the token; the commit includes the caller's pending changes (e.g. the new password)."""
+    # A used token must not be served from the per-request lookup cache anymore.
+    g.pop("_pwreset_lookup", None)
+    db.session.execute(
+        update(PasswordResetToken)
+        .where(PasswordResetToken.id == record.id)
+        .values(used_at=utcnow())
+        .execution_options(synchronize_session=False)
+    )
     db.session.commit()
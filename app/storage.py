@@ -1,6 +1,10 @@
+import io
 import uuid
 import os
+import shutil
+import stat
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from flask import current_app
@@ -8,6 +12,14 @@ from werkzeug.utils import secure_filename
 
 from . import supabase
 
+# Upper bound on concurrent storage uploads per request (see save_files)
+_SAVE_MAX_WORKERS = 8
+
+# Non-seekable upload streams are spooled before sending; larger ones go to disk
+_SPOOL_MAX_MEMORY_BYTES = 1024 * 1024
+_COPY_BUFFER_BYTES = 64 * 1024
+_LOCAL_COPY_BUFFER_BYTES = 1024 * 1024
+
 
 def _is_vercel() -> bool:
     return str(os.environ.get("VERCEL") or "").strip().lower() in {"1", "true", "yes"} or bool(
@@ -46,7 +58,7 @@ def save_file(file_storage, application_id: int) -> dict:
     """
     Save uploaded file to storage (Supabase or local filesystem).
     
-    Returns dict with file_url, file_name, and file_type.
+    Returns dict with file_url, file_name, file_type and size_bytes.
     """
     storage_mode = (current_app.config.get("STORAGE_MODE") or "local").strip().lower()
     
@@ -56,6 +68,41 @@ def save_file(file_storage, application_id: int) -> dict:
         return _save_file_local(file_storage, application_id)
 
 
+def save_files(file_storages: list, application_id: int) -> list[dict]:
+    """
+    Save several uploads concurrently; results are in input order (same dicts as save_file).
+
+    Storage calls are network-bound, so the uploads overlap instead of running back to back.
+    If any upload fails, the ones that succeeded are deleted again (best-effort) and the first
+    error is re-raised, so callers see the same exceptions as with save_file.
+    """
+    if len(file_storages) <= 1:
+        return [save_file(f, application_id) for f in file_storages]
+
+    app = current_app._get_current_object()
+
+    def _save(file_storage):
+        with app.app_context():
+            return save_file(file_storage, application_id)
+
+    with ThreadPoolExecutor(max_workers=min(len(file_storages), _SAVE_MAX_WORKERS)) as executor:
+        futures = [executor.submit(_save, f) for f in file_storages]
+
+    saved = []
+    first_error = None
+    for future in futures:
+        exc = future.exception()
+        if exc is None:
+            saved.append(future.result())
+        elif first_error is None:
+            first_error = exc
+    if first_error is not None:
+        for s in saved:
+            delete_file(s["file_url"])
+        raise first_error
+    return saved
+
+
 def _save_file_supabase(file_storage, application_id: int) -> dict:
     """Save file to Supabase Storage."""
     extension = Path(file_storage.filename or "").suffix.lower()
@@ -64,25 +111,24 @@ def _save_file_supabase(file_storage, application_id: int) -> dict:
     if extension and not object_path.endswith(extension):
         object_path += extension
 
-    # Read file content
-    stream = getattr(file_storage, "stream", None)
-    if stream is not None:
-        try:
-            stream.seek(0)
-        except Exception:
-            pass
-        file_bytes = stream.read()
-    else:
-        # Fallback (should be rare)
-        try:
-            file_bytes = file_storage.read()
-        except Exception:
-            file_bytes = b""
-    
-    # Upload to Supabase Storage
-    supabase.storage_upload_bytes(
+    # Upload straight from the request's stream (Werkzeug spools larger parts to a temp file)
+    stream = getattr(file_storage, "stream", None) or io.BytesIO(b"")
+    try:
+        stream.seek(0, os.SEEK_END)
+        size_bytes = stream.tell()
+        stream.seek(0)
+    except Exception:
+        # Non-seekable stream: spool it so the size is known up front
+        spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_MEMORY_BYTES)
+        shutil.copyfileobj(stream, spool, length=_COPY_BUFFER_BYTES)
+        size_bytes = spool.tell()
+        spool.seek(0)
+        stream = spool
+
+    supabase.storage_upload_stream(
         object_path=object_path,
-        file_bytes=file_bytes,
+        stream=stream,
+        size_bytes=size_bytes,
         content_type=file_storage.mimetype,
         upsert=False,
     )
@@ -92,6 +138,7 @@ def _save_file_supabase(file_storage, application_id: int) -> dict:
         "file_url": object_path,  # Store path, not full URL
         "file_name": file_storage.filename or "upload",
         "file_type": file_storage.mimetype or None,
+        "size_bytes": size_bytes,
     }
 
 
@@ -113,14 +160,29 @@ def _save_file_local(file_storage, application_id: int) -> dict:
 
     destination = uploads_root / object_name
     destination.parent.mkdir(parents=True, exist_ok=True)
-    file_storage.save(destination)
+    # Werkzeug's save() copies in 16 KiB chunks; a larger buffer means far fewer write() calls
+    with open(destination, "wb") as dst:
+        shutil.copyfileobj(file_storage.stream, dst, length=_LOCAL_COPY_BUFFER_BYTES)
     return {
         "file_url": str(destination),
         "file_name": file_storage.filename or "upload",
         "file_type": file_storage.mimetype or None,
+        "size_bytes": destination.stat().st_size,
     }
 
 
+def uploads_relative_path(file_path: str) -> str | None:
+    """
+    Path of a locally stored file relative to the uploads root (POSIX separators),
+    or None if the file lives elsewhere (e.g. the /tmp fallback).
+    """
+    # Purely lexical (no filesystem access); stored paths are absolute and normalized
+    try:
+        return Path(os.path.abspath(file_path)).relative_to(os.path.abspath(_uploads_root())).as_posix()
+    except ValueError:
+        return None
+
+
 def get_file_url(file_path: str, expires_in: int = 120) -> str:
     """
     Get a URL for accessing a stored file.
@@ -193,6 +255,19 @@ def filestorage_size_bytes(file_storage) -> int | None:
     except Exception:
         pass
 
+    # Non-seekable streams: ask the OS / the buffer before scanning. fileno() is deliberately not
+    # tried first: on an in-memory SpooledTemporaryFile it forces a rollover to disk.
+    try:
+        st = os.fstat(stream.fileno())
+        if stat.S_ISREG(st.st_mode):
+            return int(st.st_size)
+    except (AttributeError, OSError, ValueError):
+        pass
+    try:
+        return stream.getbuffer().nbytes
+    except (AttributeError, ValueError):
+        pass
+
     # Fallback: read stream (may be expensive; used only if needed)
     try:
         pos = stream.tell()
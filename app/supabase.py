@@ -1,9 +1,17 @@
+import io
 import json
 from dataclasses import dataclass
-from typing import Any
-from urllib import error, parse, request
+from typing import Any, BinaryIO
+from urllib import error, parse
 
-from flask import current_app
+from flask import current_app, g
+
+from .http_utils import send_request
+
+try:
+    import orjson
+except ImportError:  # optional speedup; the stdlib json module is used without it
+    orjson = None
 
 
 class SupabaseAPIError(RuntimeError):
@@ -27,19 +35,45 @@ def _as_bool(value: Any, default: bool = False) -> bool:
     return str(value).strip().lower() in {"1", "true", "yes", "on"}
 
 
+@dataclass(frozen=True)
+class _SupabaseConfig:
+    """Normalized Supabase settings, read from app config once per app context (see _config)."""
+
+    url: str
+    service_role_key: str
+    anon_or_service_key: str
+    storage_bucket: str
+
+    @classmethod
+    def from_config(cls, config) -> "_SupabaseConfig":
+        service_role_key = (config.get("SUPABASE_SERVICE_ROLE_KEY") or "").strip()
+        return cls(
+            url=(config.get("SUPABASE_URL") or "").strip().rstrip("/"),
+            service_role_key=service_role_key,
+            anon_or_service_key=(config.get("SUPABASE_ANON_KEY") or "").strip() or service_role_key,
+            storage_bucket=(config.get("SUPABASE_STORAGE_BUCKET") or "").strip(),
+        )
+
+
+def _config() -> _SupabaseConfig:
+    # Memoized on `g`, so a request (or background task) that signs or deletes many objects
+    # normalizes the config once; a new context picks up config changes.
+    cfg = g.get("_supabase_config")
+    if cfg is None:
+        cfg = g._supabase_config = _SupabaseConfig.from_config(current_app.config)
+    return cfg
+
+
 def _supabase_url() -> str:
-    return (current_app.config.get("SUPABASE_URL") or "").strip().rstrip("/")
+    return _config().url
 
 
 def _service_role_key() -> str:
-    return (current_app.config.get("SUPABASE_SERVICE_ROLE_KEY") or "").strip()
+    return _config().service_role_key
 
 
 def _anon_or_service_key() -> str:
-    anon = (current_app.config.get("SUPABASE_ANON_KEY") or "").strip()
-    if anon:
-        return anon
-    return _service_role_key()
+    return _config().anon_or_service_key
 
 
 def supabase_auth_enabled() -> bool:
@@ -51,8 +85,9 @@ def supabase_storage_enabled() -> bool:
 
 
 def _require_supabase_base() -> tuple[str, str]:
-    base_url = _supabase_url()
-    service_key = _service_role_key()
+    cfg = _config()
+    base_url = cfg.url
+    service_key = cfg.service_role_key
     if not base_url:
         raise SupabaseAPIError("SUPABASE_URL is not configured")
     if not service_key:
@@ -60,6 +95,19 @@ def _require_supabase_base() -> tuple[str, str]:
     return base_url, service_key
 
 
+def _json_dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value).encode("utf-8")
+
+
+def _json_loads(raw: bytes | str) -> Any:
+    # Both parse bytes directly; orjson.JSONDecodeError subclasses json.JSONDecodeError
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
 def _request_json(
     *,
     method: str,
@@ -89,20 +137,18 @@ def _request_json(
     if extra_headers:
         headers.update(extra_headers)
     if body is not None:
-        data = json.dumps(body).encode("utf-8")
+        data = _json_dumps(body)
 
-    req = request.Request(endpoint, data=data, method=method, headers=headers)
     try:
-        with request.urlopen(req, timeout=30) as resp:
-            raw = resp.read().decode("utf-8", errors="replace").strip()
-            if not raw:
-                return {}
-            return json.loads(raw)
+        _, raw = send_request(method, endpoint, data=data, headers=headers, timeout=30)
+        if not raw.strip():
+            return {}
+        return _json_loads(raw)
     except error.HTTPError as exc:
         payload = exc.read().decode("utf-8", errors="replace")
         details = payload
         try:
-            details_json = json.loads(payload) if payload else {}
+            details_json = _json_loads(payload) if payload else {}
             if isinstance(details_json, dict):
                 details = (
                     details_json.get("msg")
@@ -223,32 +269,48 @@ def admin_delete_user(user_id: str) -> None:
 
 
 def _storage_bucket() -> str:
-    return (current_app.config.get("SUPABASE_STORAGE_BUCKET") or "").strip()
+    return _config().storage_bucket
 
 
 def storage_url(object_path: str, *, expires_in: int = 120, bucket: str | None = None) -> str:
+    signed = storage_urls([object_path], expires_in=expires_in, bucket=bucket).get(object_path)
+    if not signed:
+        raise SupabaseAPIError("Supabase did not return a signed URL")
+    return signed
+
+
+def storage_urls(object_paths: list[str], *, expires_in: int = 120, bucket: str | None = None) -> dict[str, str]:
+    """
+    Signed URLs for several objects with one request (bulk sign endpoint): {object_path: url}.
+
+    Paths Supabase could not sign (e.g. missing objects) are left out of the result.
+    """
     bucket_name = (bucket or _storage_bucket()).strip()
     if not bucket_name:
         raise SupabaseAPIError("SUPABASE_STORAGE_BUCKET is not configured")
+    paths = list(dict.fromkeys(object_paths))
+    if not paths:
+        return {}
     result = _request_json(
         method="POST",
-        path=f"/storage/v1/object/sign/{parse.quote(bucket_name)}/{parse.quote(object_path, safe='/')}",
-        body={"expiresIn": int(expires_in)},
+        path=f"/storage/v1/object/sign/{parse.quote(bucket_name)}",
+        body={"expiresIn": int(expires_in), "paths": paths},
         use_service_auth=True,
         use_anon_key=False,
     )
-    signed = (
-        (result or {}).get("signedURL")
-        or (result or {}).get("signedUrl")
-        or (result or {}).get("url")
-        or ""
-    )
-    if not signed:
-        raise SupabaseAPIError("Supabase did not return a signed URL")
-    if signed.startswith("http://") or signed.startswith("https://"):
-        return signed
     base_url = _supabase_url()
-    return f"{base_url}{signed}"
+    urls: dict[str, str] = {}
+    for item in result if isinstance(result, list) else []:
+        if not isinstance(item, dict) or item.get("error"):
+            continue
+        path = item.get("path")
+        signed = item.get("signedURL") or item.get("signedUrl") or item.get("url") or ""
+        if not path or not signed:
+            continue
+        if not (signed.startswith("http://") or signed.startswith("https://")):
+            signed = f"{base_url}{signed}"
+        urls[path] = signed
+    return urls
 
 
 def storage_upload_bytes(
@@ -259,6 +321,31 @@ def storage_upload_bytes(
     bucket: str | None = None,
     upsert: bool = False,
 ) -> None:
+    storage_upload_stream(
+        object_path,
+        io.BytesIO(file_bytes),
+        len(file_bytes),
+        content_type=content_type,
+        bucket=bucket,
+        upsert=upsert,
+    )
+
+
+def storage_upload_stream(
+    object_path: str,
+    stream: BinaryIO,
+    size_bytes: int,
+    *,
+    content_type: str | None = None,
+    bucket: str | None = None,
+    upsert: bool = False,
+) -> None:
+    """
+    Upload from a readable file object positioned at the start of the content.
+
+    http.client sends it in blocks, so the file is never held in memory as a whole.
+    size_bytes is sent as Content-Length (without it http.client would fall back to chunked encoding).
+    """
     base_url, service_key = _require_supabase_base()
     bucket_name = (bucket or _storage_bucket()).strip()
     if not bucket_name:
@@ -272,12 +359,11 @@ def storage_upload_bytes(
         "apikey": service_key,
         "Authorization": f"Bearer {service_key}",
         "Content-Type": content_type or "application/octet-stream",
+        "Content-Length": str(int(size_bytes)),
         "x-upsert": "true" if upsert else "false",
     }
-    req = request.Request(endpoint, data=file_bytes, method="POST", headers=headers)
     try:
-        with request.urlopen(req, timeout=60):
-            return
+        send_request("POST", endpoint, data=stream, headers=headers, timeout=60)
     except error.HTTPError as exc:
         payload = exc.read().decode("utf-8", errors="replace")
         raise SupabaseAPIError(
@@ -302,10 +388,8 @@ def storage_delete_object(object_path: str, *, bucket: str | None = None) -> Non
         "apikey": service_key,
         "Authorization": f"Bearer {service_key}",
     }
-    req = request.Request(endpoint, method="DELETE", headers=headers)
     try:
-        with request.urlopen(req, timeout=30):
-            return
+        send_request("DELETE", endpoint, headers=headers, timeout=30)
     except error.HTTPError as exc:
         # Ignore object-not-found cases so retention cleanup stays idempotent.
         if exc.code == 404:
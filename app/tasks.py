@@ -2,6 +2,7 @@ from datetime import date, datetime, timedelta, timezone
 from typing import Optional
 
 import click
+from sqlalchemy import select
 from werkzeug.security import generate_password_hash
 
 from .extensions import db
@@ -86,21 +87,25 @@ def register_cli(app):
         months = int(app.config.get("RETENTION_MONTHS", 6))
         cutoff = datetime.now(timezone.utc) - timedelta(days=months * 30)
 
-        old_apps = Application.query.filter(Application.created_at <= cutoff).all()
-        deleted_apps = 0
+        # Stream file paths in batches instead of loading every old application + attachment row
+        file_urls = db.session.execute(
+            select(Attachment.file_url)
+            .join(Application, Application.id == Attachment.application_id)
+            .where(Application.created_at <= cutoff)
+            .execution_options(yield_per=200)
+        ).scalars()
         deleted_files = 0
-
-        for application in old_apps:
-            attachments = Attachment.query.filter_by(application_id=application.id).all()
-            for att in attachments:
-                try:
-                    if att.file_url:
-                        delete_file(att.file_url)
-                        deleted_files += 1
-                except Exception:
-                    pass
-            db.session.delete(application)
-            deleted_apps += 1
+        for file_url in file_urls:
+            try:
+                if file_url:
+                    delete_file(file_url)
+                    deleted_files += 1
+            except Exception:
+                pass
+
+        deleted_apps = (
+            Application.query.filter(Application.created_at <= cutoff).delete(synchronize_session=False)
+        )
 
         db.session.commit()
         app.logger.info("Retention cleanup: deleted %s applications and %s files", deleted_apps, deleted_files)
@@ -325,6 +330,7 @@ def register_cli(app):
                     file_url=str(dest),
                     file_name=name,
                     file_type="text/plain",
+                    size_bytes=dest.stat().st_size,
                     document_type=doc_type,
                     uploaded_by=uploaded_by,
                 )
@@ -373,6 +379,7 @@ def register_cli(app):
                 inst = ApplicationStepInstance(
                     application_id=app_row.id,
                     step_id=step.id,
+                    step_order=step.step_order,
                     state="open",
                     data_json=None,
                 )
@@ -467,7 +474,9 @@ def register_cli(app):
         db.session.commit()
 
         recruiters = User.query.filter_by(role="recruiter").order_by(User.email.asc()).all()
-        admins = User.query.filter_by(role="admin").order_by(User.email.asc()).all()
+        admin_ids = db.session.execute(
+            select(User.id).where(User.role == "admin").order_by(User.email.asc())
+        ).scalars().all()
 
         def pick_recruiter() -> int | None:
             return random.choice(recruiters).id if recruiters else None
@@ -518,7 +527,7 @@ def register_cli(app):
             existing = WorkflowStep.query.filter_by(workflow_id=wf.id).order_by(WorkflowStep.step_order.asc()).all()
             if not existing:
                 for idx, (sname, stype) in enumerate(steps, start=1):
-                    owner_id = (admins[0].id if (sname.lower().startswith("offer") and admins) else pick_recruiter())
+                    owner_id = (admin_ids[0] if (sname.lower().startswith("offer") and admin_ids) else pick_recruiter())
                     step = WorkflowStep(
                         workflow_id=wf.id,
                         step_order=idx,
@@ -651,6 +660,7 @@ def register_cli(app):
                 file_url=str(dest),
                 file_name=filename,
                 file_type="application/pdf",
+                size_bytes=dest.stat().st_size,
                 document_type=doc_type,
                 uploaded_by=uploaded_by,
             )
@@ -804,6 +814,7 @@ def register_cli(app):
                 inst = ApplicationStepInstance(
                     application_id=app_row.id,
                     step_id=step.id,
+                    step_order=step.step_order,
                     state=state,
                     data_json=data,
                     completed_at=completed,
@@ -0,0 +1,14 @@
+-- Indexes for the internal application list and unread notification lookups
+
+-- Status tabs filter by status and sort by created_at DESC
+CREATE INDEX IF NOT EXISTS idx_applications_status_created_at
+    ON applications (status, created_at);
+
+-- Active-step joins (same name SQLAlchemy uses for the model's index=True)
+CREATE INDEX IF NOT EXISTS ix_applications_current_step_id
+    ON applications (current_step_id);
+
+-- Unread notifications per user/application
+CREATE INDEX IF NOT EXISTS idx_notifications_user_unread
+    ON notifications (user_id, application_id)
+    WHERE seen_at IS NULL;
@@ -0,0 +1,14 @@
+-- Denormalize workflow step order onto step instances so the next open step
+-- can be found from application_step_instances alone
+
+ALTER TABLE application_step_instances
+  ADD COLUMN IF NOT EXISTS step_order INTEGER;
+
+UPDATE application_step_instances AS asi
+   SET step_order = ws.step_order
+  FROM workflow_steps AS ws
+ WHERE ws.id = asi.step_id
+   AND asi.step_order IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_step_instances_app_state_order
+    ON application_step_instances (application_id, state, step_order);
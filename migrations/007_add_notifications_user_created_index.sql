@@ -0,0 +1,3 @@
+-- Notification list filters by user and sorts by created_at DESC (LIMIT 100)
+CREATE INDEX IF NOT EXISTS idx_notifications_user_created
+    ON notifications (user_id, created_at DESC);
@@ -0,0 +1,3 @@
+-- Store upload size so per-application quotas are a SUM() instead of per-file stat/HEAD calls
+ALTER TABLE attachments
+  ADD COLUMN IF NOT EXISTS size_bytes BIGINT;
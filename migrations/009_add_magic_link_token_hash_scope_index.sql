@@ -0,0 +1,4 @@
+-- Magic link lookups filter on (token_hash, scope). token_hash is a raw 20-byte keyed BLAKE2b digest;
+-- rows issued before that switch hold a 32-byte HMAC-SHA256 digest and are still looked up alongside it.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_magic_link_tokens_hash_scope
+    ON magic_link_tokens (token_hash, scope);
@@ -0,0 +1,3 @@
+-- Candidate/recruiter upload lists filter by application and sort by id DESC
+CREATE INDEX IF NOT EXISTS idx_attachments_application_id_desc
+    ON attachments (application_id, id DESC);
@@ -0,0 +1,3 @@
+-- Public job listing filters on published/published_until and sorts by created_at DESC
+CREATE INDEX IF NOT EXISTS idx_job_postings_public
+    ON job_postings (published, published_until, created_at DESC);
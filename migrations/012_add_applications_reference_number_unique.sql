@@ -0,0 +1,6 @@
+-- apply() relies on this constraint instead of a SELECT-before-insert loop
+ALTER TABLE applications
+  ADD COLUMN IF NOT EXISTS reference_number VARCHAR(50);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_applications_reference_number
+    ON applications (reference_number);
@@ -0,0 +1,6 @@
+-- Public job search filters with title ILIKE '%q%'; a leading wildcard cannot use a B-tree,
+-- a trigram GIN index can
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_job_postings_title_trgm
+    ON job_postings USING gin (title gin_trgm_ops);